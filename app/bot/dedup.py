@@ -0,0 +1,99 @@
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.config import get_settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class UpdateDeduplicator:
+    """Окно недавних update_id для отбрасывания повторных доставок.
+
+    Telegram повторяет обновление, если вебхук ответил медленно или с
+    ошибкой. Локальное окно ограничено window_size последними id. Если
+    задан redis_url, id дополнительно регистрируются в Redis (SET NX с TTL),
+    чтобы повторы отбрасывались и при нескольких процессах.
+    """
+
+    KEY_PREFIX = 'tg:update:'
+
+    def __init__(self, window_size: int, ttl: int, redis_url: Optional[str] = None):
+        self.window_size = window_size
+        self.ttl = ttl
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+        self._redis = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("redis is not installed: update dedup is process-local")
+            else:
+                self._redis = aioredis.from_url(redis_url)
+        self.duplicates = 0
+        self.backend_errors = 0
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        """
+        Проверяет update_id и запоминает его.
+
+        Returns:
+            bool: True, если обновление уже принималось
+        """
+        if update_id in self._seen:
+            self.duplicates += 1
+            return True
+
+        if self._redis is not None:
+            try:
+                created = await self._redis.set(f"{self.KEY_PREFIX}{update_id}", 1, nx=True, ex=self.ttl)
+                if not created:
+                    self._remember(update_id)
+                    self.duplicates += 1
+                    return True
+            except Exception as e:
+                # Без общего хранилища продолжаем с локальным окном
+                self.backend_errors += 1
+                logger.warning(f"Update dedup backend error: {e}")
+
+        self._remember(update_id)
+        return False
+
+    async def forget(self, update_id: int):
+        """Забывает id обновления, которое не удалось принять (его доставят снова)"""
+        self._seen.pop(update_id, None)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(f"{self.KEY_PREFIX}{update_id}")
+            except Exception as e:
+                self.backend_errors += 1
+                logger.warning(f"Update dedup backend error: {e}")
+
+    def _remember(self, update_id: int):
+        self._seen[update_id] = None
+        while len(self._seen) > self.window_size:
+            self._seen.popitem(last=False)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счетчики отброшенных повторов"""
+        return {
+            'window': len(self._seen),
+            'duplicates': self.duplicates,
+            'backend': 'redis' if self._redis is not None else 'memory',
+            'backend_errors': self.backend_errors
+        }
+
+
+update_dedup = UpdateDeduplicator(
+    window_size=settings.TELEGRAM_DEDUP_WINDOW,
+    ttl=settings.TELEGRAM_DEDUP_TTL,
+    redis_url=settings.REDIS_URL
+)
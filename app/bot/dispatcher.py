@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+UpdateHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def get_update_user_id(update_data: Dict[str, Any]) -> Optional[int]:
+    """Достает id пользователя из сырого обновления Telegram"""
+    for kind in ('message', 'edited_message', 'callback_query', 'inline_query', 'my_chat_member'):
+        payload = update_data.get(kind)
+        if payload and payload.get('from'):
+            return payload['from'].get('id')
+    return None
+
+
+class UpdateDispatcher:
+    """Фоновая обработка обновлений Telegram.
+
+    Вебхук только ставит обновление в очередь и сразу отвечает. Обновления
+    одного пользователя выполняются строго по порядку, разных пользователей -
+    параллельно, но не больше concurrency одновременно.
+    """
+
+    def __init__(self, handler: UpdateHandler, concurrency: int, max_pending: int):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self._queues: Dict[Hashable, Deque[Dict[str, Any]]] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._accepting = False
+        self.pending = 0
+        self.active = 0
+        self.max_depth = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_latency = 0.0
+
+    async def start(self):
+        """Начинает принимать обновления"""
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._accepting = True
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Перестает принимать обновления и дожидается очереди не дольше timeout"""
+        if timeout is None:
+            timeout = settings.TELEGRAM_SHUTDOWN_TIMEOUT
+        self._accepting = False
+        workers = list(self._workers.values())
+        if not workers:
+            return
+        done, still_running = await asyncio.wait(workers, timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        if still_running:
+            logger.warning("Dropped %d update queues on shutdown", len(still_running))
+
+    def submit(self, update_data: Dict[str, Any]) -> bool:
+        """
+        Ставит обновление в очередь пользователя.
+
+        Returns:
+            bool: False, если диспетчер остановлен или очередь переполнена
+        """
+        if not self._accepting or self.pending >= self.max_pending:
+            self.rejected += 1
+            return False
+
+        key = get_update_user_id(update_data) or ('update', update_data.get('update_id'))
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        queue.append((time.monotonic(), update_data))
+        self.pending += 1
+        self.max_depth = max(self.max_depth, len(queue))
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.ensure_future(self._drain(key, queue))
+        return True
+
+    async def _drain(self, key: Hashable, queue: Deque):
+        """Выполняет очередь одного пользователя по порядку"""
+        try:
+            while queue:
+                queued_at, update_data = queue.popleft()
+                async with self._semaphore:
+                    self.active += 1
+                    try:
+                        await self.handler(update_data)
+                        self.processed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        logger.error(f"Error processing update {update_data.get('update_id')}: {e}",
+                                     exc_info=True)
+                    finally:
+                        self.active -= 1
+                        self.pending -= 1
+                        self.total_latency += time.monotonic() - queued_at
+        finally:
+            del self._workers[key]
+            del self._queues[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очередей и счетчики обработки"""
+        finished = self.processed + self.failed
+        return {
+            'pending': self.pending,
+            'active': self.active,
+            'users_queued': len(self._queues),
+            'max_user_queue_depth': self.max_depth,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'avg_latency': self.total_latency / finished if finished else 0.0
+        }
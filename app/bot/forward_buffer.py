@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (id пользователя, последнее сообщение пачки, собранные данные)
+FlushHandler = Callable[[int, Any, List[Dict]], Awaitable[None]]
+
+
+class ForwardCollector:
+    """Собирает пересланные сообщения пользователя в пачки.
+
+    Пересылки одного пользователя копятся, пока между ними меньше
+    quiet_window секунд (но не дольше max_delay с первой), после чего
+    пачка передается обработчику целиком: одно обновление состояния и
+    один ответ вместо ответа на каждое сообщение.
+    """
+
+    def __init__(self, on_flush: FlushHandler, quiet_window: float, max_delay: float):
+        self.on_flush = on_flush
+        self.quiet_window = quiet_window
+        self.max_delay = max_delay
+        # id пользователя -> (время первой пересылки, последнее сообщение, данные)
+        self._buffers: Dict[int, Tuple[float, Any, List[Dict]]] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self.collected = 0
+        self.flushes = 0
+
+    def add(self, user_id: int, message, item: Dict):
+        """Добавляет пересылку и откладывает обработку пачки"""
+        started, _, items = self._buffers.get(user_id, (time.monotonic(), None, []))
+        items.append(item)
+        self._buffers[user_id] = (started, message, items)
+        self.collected += 1
+
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        delay = min(self.quiet_window, max(0.0, started + self.max_delay - time.monotonic()))
+        self._timers[user_id] = asyncio.ensure_future(self._flush_later(user_id, delay))
+
+    async def _flush_later(self, user_id: int, delay: float):
+        await asyncio.sleep(delay)
+        # Дальше таймер не отменяется: пачка уже забирается на обработку
+        self._timers.pop(user_id, None)
+        await self.flush(user_id)
+
+    async def flush(self, user_id: int):
+        """Немедленно обрабатывает накопленную пачку пользователя (если есть)"""
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        # Пачки одного пользователя обрабатываются строго по очереди
+        async with lock:
+            buffered = self._buffers.pop(user_id, None)
+            if buffered is None:
+                return
+            _, message, items = buffered
+            self.flushes += 1
+            try:
+                await self.on_flush(user_id, message, items)
+            except Exception as e:
+                logger.error(f"Error flushing forwarded messages for user {user_id}: {e}", exc_info=True)
+
+    async def flush_all(self):
+        """Обрабатывает пачки всех пользователей (при остановке приложения)"""
+        await asyncio.gather(*(self.flush(user_id) for user_id in list(self._buffers)))
+
+    def discard(self, user_id: int):
+        """Отбрасывает накопленную пачку пользователя без обработки"""
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._buffers.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Сколько пересылок собрано и сколькими пачками обработано"""
+        return {
+            'buffered_users': len(self._buffers),
+            'collected': self.collected,
+            'flushes': self.flushes
+        }
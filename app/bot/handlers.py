@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Request
+import asyncio
+from fastapi import APIRouter, Request, Response
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram import Bot
 from telegram import Message
 from app.config import get_settings
-from app.trello.client import TrelloClient
+from app.trello.registry import trello_clients
+from app.services.board_summary import board_summary
 from app.ai.processor import AIProcessor
 from app.bot.state_manager import state_manager
+from app.bot.dispatcher import UpdateDispatcher
+from app.bot.routing import parse_update, route_update
+from app.bot.dedup import update_dedup
+from app.bot.send_queue import outbox
+from app.bot.telegram_client import TelegramAPIError
+from app.bot.forward_buffer import ForwardCollector
 try:
     from app.utils.context import context_analyzer
 except ImportError:
@@ -29,10 +37,10 @@ logger = logging.getLogger(__name__)
 # Инициализация компонентов
 router = APIRouter(prefix="/webhook", tags=["telegram"])
 settings = get_settings()
-trello_client = TrelloClient()
 ai_processor = AIProcessor()
 
-# Создаем бота
+# Бот нужен только для разбора обновлений (Update.de_json);
+# сообщения отправляются асинхронно через очередь outbox
 bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
 
 # Клавиатура для основного меню
@@ -66,12 +74,40 @@ def get_list_keyboard(lists: List[Dict[str, Any]], board_id: str) -> InlineKeybo
     keyboard.append([InlineKeyboardButton("⬅️ К доскам", callback_data="back_to_boards")])
     return InlineKeyboardMarkup(keyboard)
 
+def get_analysis_keyboard(tasks: List[Dict]) -> InlineKeyboardMarkup:
+    """Клавиатура создания задач из анализа"""
+    keyboard = []
+    if len(tasks) == 1:
+        keyboard.append([
+            InlineKeyboardButton("✅ Создать задачу", callback_data="create_analyzed_task_0")
+        ])
+    else:
+        for i, _ in enumerate(tasks):
+            keyboard.append([
+                InlineKeyboardButton(f"✅ Создать задачу {i+1}", 
+                                   callback_data=f"create_analyzed_task_{i}")
+            ])
+        keyboard.append([
+            InlineKeyboardButton(f"✅ Создать все ({len(tasks)})", 
+                               callback_data="create_all_analyzed_tasks")
+        ])
+
+    keyboard.append([
+        InlineKeyboardButton("🔄 Изменить", callback_data="edit_analysis"),
+        InlineKeyboardButton("❌ Отмена", callback_data="cancel_analysis")
+    ])
+    return InlineKeyboardMarkup(keyboard)
+
 # Предыдущие обработчики команд и сообщений
      
 async def handle_list_selection(update: Update, list_id: str):
     try:
-        lst = await trello_client.get_list(list_id)
-        cards = await trello_client.get_list_cards(list_id)
+        trello_client = await trello_clients.get_client_for_user(update.callback_query.from_user.id)
+        # Карточки приходят вместе с никнеймами участников
+        lst, cards = await asyncio.gather(
+            trello_client.get_list(list_id, preset='list_view'),
+            trello_client.get_list_cards(list_id, preset='list_view')
+        )
         
         reply_text = f"📋 *Список: {lst['name']}*\n"
         reply_text += f"_Последнее обновление: {lst.get('dateLastActivity', 'не указано')}_\n\n"
@@ -111,7 +147,7 @@ async def handle_list_selection(update: Update, list_id: str):
                 
                 # Участники (только никнеймы)
                 if card.get('idMembers'):
-                    members = await trello_client.get_card_members(card['id'])
+                    members = card.get('members')
                     if members:
                         usernames = [m.get('username', '') for m in members if m.get('username')]
                         if usernames:
@@ -141,28 +177,31 @@ async def handle_list_selection(update: Update, list_id: str):
         ]
         
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             reply_text,
             reply_markup=reply_markup,
             parse_mode='Markdown'
         )
     except Exception as e:
         print(f"Error in list selection: {e}")
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             "Произошла ошибка при получении информации о списке."
         )
      
 async def handle_board_selection(update: Update, board_id: str):
     """Обработка выбора доски"""
     try:
-        # Получаем списки на доске
-        lists = await trello_client.get_board_lists(board_id)
+        trello_client = await trello_clients.get_client_for_user(update.callback_query.from_user.id)
+        # Списки доски вместе с id карточек - один запрос на весь экран
+        lists = await trello_client.get_board_lists(board_id, preset='board_view')
         
         keyboard = []
         reply_text = "Выберите список для просмотра или создания задачи:\n\n"
         
         for lst in lists:
-            cards_count = len(await trello_client.get_list_cards(lst['id']))
+            cards_count = len(lst.get('cards', []))
             reply_text += f"📑 *{lst['name']}* ({cards_count} задач)\n"
             keyboard.append([InlineKeyboardButton(
                 f"📑 {lst['name']}",
@@ -173,7 +212,8 @@ async def handle_board_selection(update: Update, board_id: str):
         keyboard.append([InlineKeyboardButton("⬅️ К доскам", callback_data="back_to_boards")])
         
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             reply_text,
             reply_markup=reply_markup,
             parse_mode='Markdown'
@@ -185,17 +225,22 @@ async def handle_board_selection(update: Update, board_id: str):
         
     except Exception as e:
         logger.error(f"Error in board selection: {e}")
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             "Произошла ошибка при получении списков доски."
         )
         
 # Основные обработчики команд и сообщений
 async def handle_start(update: Update):
     """Обработка команды /start"""
-    user_state = state_manager.get_user_state(update.message.from_user.id)
+    user_id = update.message.from_user.id
+    user_state = state_manager.get_user_state(user_id)
     user_state.clear()
+    # Пересылки, еще не попавшие в состояние, тоже сбрасываются
+    forward_collector.discard(user_id)
     
-    await update.message.reply_text(
+    await outbox.reply(
+        update.message,
         "Привет! Я CreatmanTaskBot. Я помогу вам управлять задачами в Trello.\n\n"
         "Вы можете:\n"
         "1. Пересылать мне сообщения для создания задач\n"
@@ -207,10 +252,12 @@ async def handle_start(update: Update):
 # app/bot/handlers.py
 
 async def handle_forwarded_messages(update: Update):
-    """Обработка пересланных сообщений"""
-    logger.info("Starting handle_forwarded_messages")
+    """Обработка пересланных сообщений
+    
+    Сообщение только добавляется в пачку: ответ отправляется один раз,
+    когда пользователь перестанет пересылать (см. flush_forwarded_messages).
+    """
     user_id = update.message.from_user.id
-    user_state = state_manager.get_user_state(user_id)
     
     try:
         forward_info = {
@@ -221,30 +268,68 @@ async def handle_forwarded_messages(update: Update):
             'date': update.message.forward_date.isoformat() if update.message.forward_date else None
         }
         
-        state_manager.add_forwarded_message(user_id, forward_info)
-        messages = state_manager.get_forwarded_messages(user_id)
-        
-        keyboard = InlineKeyboardMarkup([[
-            InlineKeyboardButton("✅ Завершить и проанализировать", callback_data="analyze_messages")
-        ]])
-        
-        count_text = f"Сообщение добавлено. Всего собрано: {len(messages)}."
-        await update.message.reply_text(count_text, reply_markup=keyboard)
+        forward_collector.add(user_id, update.message, forward_info)
         
     except Exception as e:
         logger.error(f"Error in handle_forwarded_messages: {e}", exc_info=True)
-        await update.message.reply_text("Произошла ошибка при обработке сообщения.")
+        await outbox.reply(update.message, "Произошла ошибка при обработке сообщения.")
+
+async def flush_forwarded_messages(user_id: int, message, items: List[Dict]):
+    """Сохраняет пачку пересланных сообщений и обновляет счетчик
+    
+    Счетчик - одно сообщение на серию пересылок: новые пачки редактируют его.
+    """
+    state_manager.add_forwarded_messages(user_id, items)
+    messages = state_manager.get_forwarded_messages(user_id)
+    user_state = state_manager.get_user_state(user_id)
+    
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Завершить и проанализировать", callback_data="analyze_messages")
+    ]])
+    count_text = f"Сообщения добавлены. Всего собрано: {len(messages)}."
+    
+    counter = user_state.temp_data.get('forward_counter')
+    if counter and counter['chat_id'] == message.chat_id:
+        try:
+            await outbox.edit_message_text(
+                counter['chat_id'],
+                counter['message_id'],
+                count_text,
+                reply_markup=keyboard
+            )
+            return
+        except TelegramAPIError as e:
+            # Счетчик удален или слишком старый: отправим новый
+            logger.warning(f"Could not update forward counter: {e}")
+    
+    sent = await outbox.reply(message, count_text, reply_markup=keyboard)
+    user_state.temp_data['forward_counter'] = {
+        'chat_id': message.chat_id,
+        'message_id': sent['message_id']
+    }
+
+forward_collector = ForwardCollector(
+    flush_forwarded_messages,
+    quiet_window=settings.TELEGRAM_FORWARD_QUIET_WINDOW,
+    max_delay=settings.TELEGRAM_FORWARD_MAX_DELAY
+)
 
 async def analyze_forwarded_messages(update: Update):
     """Анализ пересланных сообщений через AI"""
     user_id = update.callback_query.from_user.id
     user_state = state_manager.get_user_state(user_id)
     
+    # Пересылки, которые еще копятся, тоже должны попасть в анализ
+    await forward_collector.flush(user_id)
+    # Следующая серия пересылок получит новый счетчик
+    user_state.temp_data.pop('forward_counter', None)
+    
     if not user_state.forwarded_messages:
-        await update.callback_query.message.reply_text("Нет сообщений для анализа.")
+        await outbox.reply(update.callback_query.message, "Нет сообщений для анализа.")
         return
         
     try:
+        trello_client = await trello_clients.get_client_for_user(user_id)
         context = {
             'boards': await trello_client.get_boards_with_details(),
             'preferences': state_manager.get_board_preferences(user_id),
@@ -261,7 +346,8 @@ async def analyze_forwarded_messages(update: Update):
             
         tasks = analysis.get('tasks', [])
         if not tasks:
-            await update.callback_query.message.reply_text(
+            await outbox.reply(
+                update.callback_query.message,
                 "Не удалось найти задачи в сообщениях."
             )
             return
@@ -271,7 +357,8 @@ async def analyze_forwarded_messages(update: Update):
         
     except Exception as e:
         logger.error(f"Error in analyze_forwarded_messages: {e}", exc_info=True)
-        await update.callback_query.message.reply_text(
+        await outbox.reply(
+            update.callback_query.message,
             "Произошла ошибка при анализе сообщений."
         )
 
@@ -289,13 +376,15 @@ async def handle_direct_task_creation(update: Update):
             user_state.temp_data['analysis'] = task_analysis
             await show_analysis_results(update.message, task_analysis['tasks'])
         else:
-            await update.message.reply_text(
+            await outbox.reply(
+                update.message,
                 "Не удалось создать задачу. Попробуйте описать задачу подробнее."
             )
             
     except Exception as e:
         logger.error(f"Error in direct task creation: {e}", exc_info=True)
-        await update.message.reply_text(
+        await outbox.reply(
+            update.message,
             "Произошла ошибка при создании задачи."
         )
 
@@ -306,7 +395,8 @@ async def handle_task_creation_from_analysis(update: Update, task_index: int):
     
     analysis = user_state.temp_data.get('analysis')
     if not analysis or 'tasks' not in analysis:
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             "Произошла ошибка: данные анализа не найдены. Попробуйте заново."
         )
         return
@@ -317,6 +407,7 @@ async def handle_task_creation_from_analysis(update: Update, task_index: int):
         
         # Если уверенность в выборе доски высокая, создаем задачу
         if board_info.get('confidence', 0) > 0.7:
+            trello_client = await trello_clients.get_client_for_user(user_id)
             task = await trello_client.create_task_from_analysis(task_data)
             if task:
                 await show_task_creation_result(update.callback_query.message, task)
@@ -327,15 +418,118 @@ async def handle_task_creation_from_analysis(update: Update, task_index: int):
             await request_board_selection(
                 update.callback_query.message,
                 task_data,
-                analysis['context_analysis'].get('project_hints', [])
+                analysis['context_analysis'].get('project_hints', []),
+                user_id
             )
             
     except Exception as e:
         logger.error(f"Error creating task: {e}")
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             "Произошла ошибка при создании задачи. Попробуйте еще раз или создайте задачу вручную."
         )
 
+async def handle_bulk_task_creation(update: Update):
+    """Создание всех задач из анализа одним действием"""
+    user_id = update.callback_query.from_user.id
+    user_state = state_manager.get_user_state(user_id)
+    
+    analysis = user_state.temp_data.get('analysis')
+    if not analysis or not analysis.get('tasks'):
+        await outbox.edit(
+            update.callback_query.message,
+            "Произошла ошибка: данные анализа не найдены. Попробуйте заново."
+        )
+        return
+    
+    # Повторное нажатие, пока задачи создаются, не должно создать дубликаты
+    if user_state.temp_data.get('bulk_creation_in_progress'):
+        return
+    user_state.temp_data['bulk_creation_in_progress'] = True
+    
+    try:
+        trello_client = await trello_clients.get_client_for_user(user_id)
+        
+        # Как и при создании по одной, доске из рекомендации ИИ доверяем
+        # только при высокой уверенности; остальные задачи ждут выбора доски
+        board_ids = []
+        for task in analysis['tasks']:
+            board_id = task.get('board_id')
+            board_info = task.get('recommended_board', {})
+            if not board_id and board_info.get('confidence', 0) > 0.7:
+                board_id = board_info.get('id')
+            board_ids.append(board_id)
+        unique_board_ids = list({board_id for board_id in board_ids if board_id})
+        boards_lists = await asyncio.gather(*(
+            trello_client.get_board_lists(board_id, preset='keyboard')
+            for board_id in unique_board_ids
+        ))
+        list_ids_by_board = {
+            board_id: [lst['id'] for lst in lists] if isinstance(lists, list) else []
+            for board_id, lists in zip(unique_board_ids, boards_lists)
+        }
+        
+        tasks = []
+        for task, board_id in zip(analysis['tasks'], board_ids):
+            if not board_id:
+                continue
+            board_list_ids = list_ids_by_board.get(board_id, [])
+            # Выбранный пользователем список подходит, только если он на этой
+            # доске; иначе задача попадает в первый список доски
+            list_id = task.get('list_id')
+            if not list_id:
+                if user_state.selected_list_id in board_list_ids:
+                    list_id = user_state.selected_list_id
+                elif board_list_ids:
+                    list_id = board_list_ids[0]
+            tasks.append({**task, 'board_id': board_id, 'list_id': list_id})
+        
+        results = iter(await trello_client.create_tasks_bulk(tasks) if tasks else [])
+        created = []
+        remaining = []
+        for task, board_id in zip(analysis['tasks'], board_ids):
+            if not board_id:
+                remaining.append((task, 'нужно выбрать доску'))
+                continue
+            result = next(results)
+            if result['card']:
+                created.append(result['card'])
+            else:
+                remaining.append((task, result['error']))
+        
+        reply_text = f"✅ *Создано задач: {len(created)} из {len(analysis['tasks'])}*\n\n"
+        for card in created:
+            reply_text += f"• [{card['name']}]({card.get('url', '')})\n"
+        
+        # Несозданные задачи остаются в анализе, их можно создать повторно
+        reply_markup = None
+        if remaining:
+            analysis['tasks'] = [task for task, _ in remaining]
+            reply_text += "\n*Не созданы:*\n"
+            for i, (task, error) in enumerate(remaining, 1):
+                reply_text += f"{i}. ❌ {task['name']}: _{error}_\n"
+            reply_markup = get_analysis_keyboard(analysis['tasks'])
+        else:
+            user_state.temp_data.pop('analysis', None)
+        
+        await outbox.edit(
+            update.callback_query.message,
+            reply_text,
+            reply_markup=reply_markup,
+            parse_mode='Markdown',
+            disable_web_page_preview=True
+        )
+        
+    except Exception as e:
+        logger.error(f"Error creating tasks in bulk: {e}", exc_info=True)
+        await outbox.edit(
+            update.callback_query.message,
+            "Произошла ошибка при создании задач. Попробуйте еще раз или создайте их по одной.",
+            reply_markup=get_analysis_keyboard(analysis['tasks'])
+        )
+    finally:
+        user_state.temp_data.pop('bulk_creation_in_progress', None)
+
 async def show_analysis_results(message, tasks: List[Dict]):
     """Отображение результатов анализа задач"""
     reply_text = "📋 *Найденные задачи:*\n\n"
@@ -359,33 +553,20 @@ async def show_analysis_results(message, tasks: List[Dict]):
         
         reply_text += "\n"
 
-    keyboard = []
-    if len(tasks) == 1:
-        keyboard.append([
-            InlineKeyboardButton("✅ Создать задачу", callback_data="create_analyzed_task_0")
-        ])
-    else:
-        for i, _ in enumerate(tasks):
-            keyboard.append([
-                InlineKeyboardButton(f"✅ Создать задачу {i+1}", 
-                                   callback_data=f"create_analyzed_task_{i}")
-            ])
-
-    keyboard.append([
-        InlineKeyboardButton("🔄 Изменить", callback_data="edit_analysis"),
-        InlineKeyboardButton("❌ Отмена", callback_data="cancel_analysis")
-    ])
+    keyboard = get_analysis_keyboard(tasks)
 
     if isinstance(message, Message):
-        await message.reply_text(
+        await outbox.reply(
+            message,
             reply_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=keyboard,
             parse_mode='Markdown'
         )
     else:
-        await message.edit_text(
+        await outbox.edit(
+            message,
             reply_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=keyboard,
             parse_mode='Markdown'
         )
 
@@ -415,13 +596,14 @@ async def show_task_creation_result(message, task: Dict):
         ]
     ]
     
-    await message.edit_text(
+    await outbox.edit(
+        message,
         reply_text,
         reply_markup=InlineKeyboardMarkup(keyboard),
         parse_mode='Markdown'
     )
 
-async def request_board_selection(message, task_data: Dict, project_hints: List[Dict]):
+async def request_board_selection(message, task_data: Dict, project_hints: List[Dict], user_id: int):
     """Запрашивает выбор доски для задачи"""
     reply_text = "📋 *Выберите доску для задачи:*\n\n"
     reply_text += f"Задача: *{task_data['name']}*\n\n"
@@ -431,21 +613,25 @@ async def request_board_selection(message, task_data: Dict, project_hints: List[
         for hint in project_hints:
             reply_text += f"• {hint['board_name']}: _{hint['reason']}_\n"
     
-    boards = await trello_client.get_boards()
+    trello_client = await trello_clients.get_client_for_user(user_id)
+    boards = await trello_client.get_boards(preset='keyboard')
     keyboard = get_board_keyboard(boards)
     
-    await message.edit_text(
+    await outbox.edit(
+        message,
         reply_text,
         reply_markup=keyboard,
         parse_mode='Markdown'
     )
 
-async def handle_boards(message):
+async def handle_boards(message, user_id: int):
     """Показывает список досок пользователя"""
     try:
-        boards = await trello_client.get_boards_with_details()
+        trello_client = await trello_clients.get_client_for_user(user_id)
+        boards = await board_summary.get_summaries(trello_client)
         if not boards:
-            await message.reply_text(
+            await outbox.reply(
+                message,
                 "У вас пока нет досок в Trello!",
                 reply_markup=get_main_keyboard()
             )
@@ -457,16 +643,14 @@ async def handle_boards(message):
             if board.get('desc'):
                 reply_text += f"_{board['desc']}_\n"
             
-            lists_count = len(board.get('lists', []))
-            cards_count = sum(len(lst.get('cards', [])) for lst in board.get('lists', []))
-            
-            reply_text += f"📑 Списков: {lists_count}\n"
-            reply_text += f"📌 Задач: {cards_count}\n"
+            reply_text += f"📑 Списков: {board['lists_count']}\n"
+            reply_text += f"📌 Задач: {board['cards_count']}\n"
             reply_text += f"[Открыть в Trello]({board.get('url')})\n\n"
         
         keyboard = get_board_keyboard(boards)
         
-        await message.reply_text(
+        await outbox.reply(
+            message,
             reply_text,
             reply_markup=keyboard,
             parse_mode='Markdown',
@@ -475,7 +659,8 @@ async def handle_boards(message):
         
     except Exception as e:
         logger.error(f"Error getting boards: {e}")
-        await message.reply_text(
+        await outbox.reply(
+            message,
             "Произошла ошибка при получении списка досок.",
             reply_markup=get_main_keyboard()
         )
@@ -483,7 +668,8 @@ async def handle_boards(message):
 async def handle_edit_task(update: Update, task_id: str):
     """Обработка редактирования задачи"""
     try:
-        task = await trello_client.get_card(task_id)
+        trello_client = await trello_clients.get_client_for_user(update.callback_query.from_user.id)
+        task = await trello_client.get_card(task_id, preset='card_detail')
         if not task:
             raise Exception("Task not found")
         
@@ -509,7 +695,8 @@ async def handle_edit_task(update: Update, task_id: str):
             members = [member.get('username', 'Unknown') for member in task['members']]
             reply_text += f"👥 Участники: {', '.join(members)}\n"
         
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             reply_text,
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode='Markdown'
@@ -517,7 +704,8 @@ async def handle_edit_task(update: Update, task_id: str):
         
     except Exception as e:
         logger.error(f"Error editing task: {e}")
-        await update.callback_query.message.edit_text(
+        await outbox.edit(
+            update.callback_query.message,
             "Произошла ошибка при редактировании задачи."
         )
 
@@ -539,6 +727,9 @@ async def handle_callback_query(update: Update):
         elif data == 'analyze_messages':
             await analyze_forwarded_messages(update)
             
+        elif data == 'create_all_analyzed_tasks':
+            await handle_bulk_task_creation(update)
+            
         elif data.startswith('create_analyzed_task_'):
             task_index = int(data.split('_')[-1])
             await handle_task_creation_from_analysis(update, task_index)
@@ -548,27 +739,30 @@ async def handle_callback_query(update: Update):
             await handle_edit_task(update, task_id)
             
         elif data == 'refresh_boards':
-            await handle_boards(query.message)
+            await handle_boards(query.message, user_id)
             
         elif data == 'back_to_boards':
-            await handle_boards(query.message)
+            await handle_boards(query.message, user_id)
             
         elif data == 'cancel_analysis':
             user_state = state_manager.get_user_state(user_id)
             user_state.clear()
-            await query.message.edit_text(
+            forward_collector.discard(user_id)
+            await outbox.edit(
+                query.message,
                 "Анализ отменен. Вы можете начать заново.",
                 reply_markup=get_main_keyboard()
             )
             
         elif data == 'close_edit':
-            await query.message.delete()
+            await outbox.delete(query.message)
             
-        await query.answer()
+        await outbox.answer(query)
         
     except Exception as e:
         logger.error(f"Error in callback query: {e}")
-        await query.message.edit_text(
+        await outbox.edit(
+            query.message,
             "Произошла ошибка при обработке запроса."
         )
 
@@ -593,63 +787,96 @@ async def handle_help(message):
         "/help - Показать эту справку"
     )
     
-    await message.reply_text(
+    await outbox.reply(
+        message,
         help_text,
         parse_mode='Markdown',
         reply_markup=get_main_keyboard()
     )
 
-# Основной обработчик webhook
+async def process_update(update_data: Dict[str, Any]):
+    """Обработка одного обновления Telegram (выполняется в фоне диспетчером)
+    
+    Маршрут выбирается по сырому JSON. Полный объект Update строится
+    только для обработчиков, которым он нужен; для ответов на команды
+    достаточно ссылки на сообщение.
+    """
+    route = route_update(update_data)
+    logger.info("Received %s", route.summary())
+    
+    # Обработка callback query
+    if route.kind == 'callback_query':
+        await handle_callback_query(Update.de_json(update_data, bot))
+        return
+    
+    # Обработка сообщений
+    if route.kind != 'message':
+        return
+    
+    user_id = route.user_id
+    
+    # Проверяем пересланные сообщения
+    if route.is_forward:
+        await handle_forwarded_messages(Update.de_json(update_data, bot))
+        return
+        
+    # Обработка команд и текстовых сообщений
+    text = route.text
+    if not text:
+        return
+    
+    # Команда без аргументов и упоминания бота (/boards@bot в группах)
+    command = route.command
+    if command == '/start':
+        await handle_start(Update.de_json(update_data, bot))
+    elif text == '📊 Мои доски' or command == '/boards':
+        await handle_boards(route.message_ref, user_id)
+    elif text == '📋 Создать задачу' or command == '/create':
+        state_manager.get_user_state(user_id).current_action = 'creating_task'
+        await outbox.reply(
+            route.message_ref,
+            "Опишите задачу или перешлите сообщения для анализа"
+        )
+    elif text == '❓ Помощь' or command == '/help':
+        await handle_help(route.message_ref)
+    # Обработка прямого создания задачи
+    elif state_manager.get_user_state(user_id).current_action == 'creating_task':
+        await handle_direct_task_creation(Update.de_json(update_data, bot))
+
+update_dispatcher = UpdateDispatcher(
+    process_update,
+    concurrency=settings.TELEGRAM_WORKER_CONCURRENCY,
+    max_pending=settings.TELEGRAM_MAX_PENDING_UPDATES
+)
+
+# Основной обработчик webhook: только проверяет и ставит обновление в очередь,
+# поэтому время ответа Telegram не зависит от Trello и ИИ.
+# Ответ 200 означает "не доставлять повторно" (в том числе для повторов и
+# некорректных обновлений); 503 - просьба повторить доставку позже.
 @router.post("/{token}")
 async def telegram_webhook(token: str, request: Request):
     if token != settings.TELEGRAM_BOT_TOKEN:
-        return {"error": "Invalid token"}
+        return Response(status_code=403)
     
     try:
-        update_data = await request.json()
-        logger.info(f"Received update: {update_data}")
-        
-        update = Update.de_json(update_data, bot)
-        
-        # Обработка callback query
-        if update.callback_query:
-            await handle_callback_query(update)
-            return {"ok": True}
-        
-        # Обработка сообщений
-        if update.message:
-            user_id = update.message.from_user.id
-            user_state = state_manager.get_user_state(user_id)
-            
-            # Проверяем пересланные сообщения
-            if getattr(update.message, 'forward_date', None):
-                await handle_forwarded_messages(update)
-                
-            # Обработка команд и текстовых сообщений
-            elif update.message.text:
-                text = update.message.text
-                logger.info(f"Processing text message: {text}")
-                
-                if text == '/start':
-                    await handle_start(update)
-                elif text == '📊 Мои доски' or text == '/boards':
-                    await handle_boards(update.message)
-                elif text == '📋 Создать задачу' or text == '/create':
-                    user_state.current_action = 'creating_task'
-                    await update.message.reply_text(
-                        "Опишите задачу или перешлите сообщения для анализа"
-                    )
-                elif text == '❓ Помощь' or text == '/help':
-                    await handle_help(update.message)
-                # Обработка прямого создания задачи
-                elif user_state.current_action == 'creating_task':
-                    await handle_direct_task_creation(update)
-                
+        update_data = parse_update(await request.body())
+    except ValueError:
+        logger.warning("Ignoring update with invalid JSON")
         return {"ok": True}
-        
-    except Exception as e:
-        logger.error(f"Error processing update: {e}", exc_info=True)
-        return {"error": str(e)}
+    if not isinstance(update_data, dict) or 'update_id' not in update_data:
+        logger.warning("Ignoring payload without update_id")
+        return {"ok": True}
+    
+    update_id = update_data['update_id']
+    if await update_dedup.is_duplicate(update_id):
+        # Повторная доставка: обновление уже в работе или обработано
+        return {"ok": True}
+    
+    if not update_dispatcher.submit(update_data):
+        # Очередь переполнена: Telegram доставит обновление повторно
+        await update_dedup.forget(update_id)
+        return Response(status_code=503)
+    return {"ok": True}
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start."""
@@ -671,14 +898,16 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.message.reply_text(
+            await outbox.reply(
+                update.message,
                 "Please select your language / Пожалуйста, выберите язык:",
                 reply_markup=reply_markup
             )
         else:
             # Если пользователь уже авторизован
             if user.is_authorized:
-                await update.message.reply_text(
+                await outbox.reply(
+                    update.message,
                     localization.get_text("welcome_back", language=user.language)
                 )
             else:
@@ -687,7 +916,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 
     except Exception as e:
         app_logger.error(f"Ошибка в команде /start: {str(e)}")
-        await update.message.reply_text("An error occurred. Please try again.")
+        await outbox.reply(update.message, "An error occurred. Please try again.")
     finally:
         db.close()
 
@@ -708,14 +937,14 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             localization.set_language(lang)
             
             # Отправляем приветственное сообщение
-            await query.message.edit_text(localization.get_text("welcome_message"))
+            await outbox.edit(query.message, localization.get_text("welcome_message"))
             
             # Запрашиваем токен Trello
             await request_trello_token(update, context)
             
     except Exception as e:
         app_logger.error(f"Ошибка при выборе языка: {str(e)}")
-        await query.message.edit_text("An error occurred. Please try again. /start")
+        await outbox.edit(query.message, "An error occurred. Please try again. /start")
     finally:
         db.close()
 
@@ -731,7 +960,7 @@ async def request_trello_token(update: Update, context: ContextTypes.DEFAULT_TYP
 
 Отправьте токен в следующем сообщении.
 """
-    await update.effective_message.reply_text(message)
+    await outbox.reply(update.effective_message, message)
     context.user_data['waiting_for'] = 'trello_token'
 
 async def handle_trello_token(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -740,7 +969,8 @@ async def handle_trello_token(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     # Проверка формата токена
     if not TrelloService.validate_token_format(token):
-        await update.message.reply_text(
+        await outbox.reply(
+            update.message,
             "❌ Неверный формат токена. Токен должен состоять из 64 символов (цифры и буквы a-f). "
             "Пожалуйста, проверьте токен и отправьте его снова."
         )
@@ -749,14 +979,16 @@ async def handle_trello_token(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Создаем сервис Trello и проверяем валидность токена
     trello_service = TrelloService(token)
     if not trello_service.validate_token():
-        await update.message.reply_text(
+        await outbox.reply(
+            update.message,
             "❌ Токен недействителен. Пожалуйста, убедитесь, что вы правильно скопировали токен "
             "и отправьте его снова."
         )
         return
     
     # Запрашиваем email для верификации
-    await update.message.reply_text(
+    await outbox.reply(
+        update.message,
         "✅ Токен прошел проверку. Пожалуйста, введите email, который использовался "
         "для регистрации в Trello:"
     )
@@ -769,12 +1001,13 @@ async def handle_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     token = context.user_data.get('trello_token')
     
     if not token:
-        await update.message.reply_text("❌ Произошла ошибка. Пожалуйста, начните процесс заново с /start")
+        await outbox.reply(update.message, "❌ Произошла ошибка. Пожалуйста, начните процесс заново с /start")
         return
     
     trello_service = TrelloService(token)
     if not trello_service.verify_user_email(email):
-        await update.message.reply_text(
+        await outbox.reply(
+            update.message,
             "❌ Email не соответствует указанному в профиле Trello. "
             "Пожалуйста, проверьте email и отправьте его снова."
         )
@@ -790,8 +1023,11 @@ async def handle_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user.trello_token = token
             user.is_authorized = True
             db.commit()
+            # Следующие запросы пойдут с новым токеном пользователя
+            trello_clients.forget_user(update.effective_user.id)
             
-            await update.message.reply_text(
+            await outbox.reply(
+                update.message,
                 "🎉 Поздравляем! Авторизация успешно завершена. "
                 "Теперь вы можете использовать все возможности бота.\n\n"
                 "Используйте /help для просмотра доступных команд."
@@ -799,7 +1035,7 @@ async def handle_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
     except Exception as e:
         app_logger.error(f"Ошибка при сохранении данных пользователя: {str(e)}")
-        await update.message.reply_text("❌ Произошла ошибка при сохранении данных. Попробуйте позже.")
+        await outbox.reply(update.message, "❌ Произошла ошибка при сохранении данных. Попробуйте позже.")
     finally:
         db.close()
 
@@ -0,0 +1,99 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# Виды обновлений с сообщением внутри
+MESSAGE_KINDS = ('message', 'edited_message', 'channel_post', 'edited_channel_post')
+
+# Признаки пересланного сообщения (старый и новый формат Bot API)
+FORWARD_MARKERS = ('forward_date', 'forward_origin')
+
+
+def parse_update(body: bytes) -> Any:
+    """Разбирает тело вебхука (orjson, если установлен)
+
+    Raises:
+        ValueError: Тело не является корректным JSON
+    """
+    return _loads(body)
+
+
+@dataclass
+class MessageRef:
+    """Минимальная ссылка на сообщение: достаточно для ответа в чат"""
+    chat_id: int
+    message_id: int
+
+
+@dataclass
+class UpdateRoute:
+    """Поля обновления, нужные для маршрутизации, без построения объектов"""
+    update_id: int
+    kind: Optional[str]
+    user_id: Optional[int] = None
+    chat_id: Optional[int] = None
+    message_id: Optional[int] = None
+    text: Optional[str] = None
+    callback_data: Optional[str] = None
+    is_forward: bool = False
+
+    @property
+    def command(self) -> Optional[str]:
+        """Команда без аргументов и упоминания бота (/boards@bot -> /boards)"""
+        if self.text and self.text.startswith('/'):
+            return self.text.split(maxsplit=1)[0].split('@', 1)[0]
+        return None
+
+    @property
+    def message_ref(self) -> MessageRef:
+        return MessageRef(self.chat_id, self.message_id)
+
+    def summary(self) -> str:
+        """Короткое описание для лога (без текста сообщений)"""
+        parts = [f"update={self.update_id}", f"kind={self.kind}", f"user={self.user_id}"]
+        if self.callback_data is not None:
+            parts.append(f"callback={self.callback_data.split('_', 1)[0]}")
+        elif self.is_forward:
+            parts.append("forward")
+        elif self.command:
+            parts.append(f"command={self.command}")
+        elif self.text is not None:
+            parts.append(f"text_len={len(self.text)}")
+        return ' '.join(parts)
+
+
+def route_update(update_data: Dict[str, Any]) -> UpdateRoute:
+    """Извлекает поля маршрутизации из сырого обновления Telegram"""
+    route = UpdateRoute(update_id=update_data.get('update_id'), kind=None)
+
+    callback = update_data.get('callback_query')
+    if callback is not None:
+        route.kind = 'callback_query'
+        route.user_id = callback.get('from', {}).get('id')
+        route.callback_data = callback.get('data') or ''
+        message = callback.get('message') or {}
+        route.chat_id = message.get('chat', {}).get('id')
+        route.message_id = message.get('message_id')
+        return route
+
+    for kind in MESSAGE_KINDS:
+        message = update_data.get(kind)
+        if message is not None:
+            route.kind = kind
+            route.user_id = message.get('from', {}).get('id')
+            route.chat_id = message.get('chat', {}).get('id')
+            route.message_id = message.get('message_id')
+            route.text = message.get('text')
+            route.is_forward = any(marker in message for marker in FORWARD_MARKERS)
+            return route
+
+    # Остальные виды обновлений бот не обрабатывает
+    route.kind = next((key for key in update_data if key != 'update_id'), None)
+    return route
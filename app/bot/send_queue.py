@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from app.config import get_settings
+from app.bot.telegram_client import TelegramAPIError, TelegramClient, bot_api
+from app.utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+@dataclass
+class SendJob:
+    """Отложенный вызов Bot API"""
+    method: str
+    kwargs: Dict[str, Any]
+    futures: List[asyncio.Future] = field(default_factory=list)
+    edit_key: Optional[Tuple[int, int]] = None
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class SendScheduler:
+    """Очередь исходящих сообщений Telegram.
+
+    У каждого чата своя очередь, сообщения чата уходят по порядку.
+    Отправка ограничена общей корзиной (лимит бота) и корзиной чата.
+    Ожидающие подряд правки одного сообщения схлопываются в последнюю.
+    Ответ 429 с retry_after приостанавливает только этот чат; сбои сети
+    и ответы 5xx повторяются с экспоненциальной задержкой.
+    """
+
+    # Корзины чатов, которые давно не использовались, удаляются
+    # после стольких чатов
+    MAX_IDLE_BUCKETS = 1000
+
+    # Начальная задержка повтора после сбоя сети или сервера (сек)
+    TRANSIENT_RETRY_DELAY = 0.5
+
+    def __init__(self, client: TelegramClient, global_rate: float, chat_rate: float,
+                 chat_burst: int, max_retries: int):
+        self.client = client
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(rate=global_rate, capacity=global_rate)
+        self._chat_buckets: Dict[int, Tuple[TokenBucket, float]] = {}
+        self._queues: Dict[int, Deque[SendJob]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._pending_edits: Dict[Tuple[int, int], SendJob] = {}
+        self.sent = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.max_wait = 0.0
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> Dict[str, Any]:
+        """Отправить сообщение через очередь чата"""
+        return await self._enqueue(chat_id, SendJob(
+            'send_message', dict(chat_id=chat_id, text=text, **kwargs)
+        ))
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str,
+                                **kwargs) -> Optional[Dict[str, Any]]:
+        """Изменить сообщение
+        
+        Если последняя задача в очереди чата - ожидающая правка того же
+        сообщения, она заменяется этой. Правка, за которой уже стоят другие
+        сообщения, не трогается: иначе новая правка обогнала бы их.
+        """
+        params = dict(chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+        key = (chat_id, message_id)
+        pending = self._pending_edits.get(key)
+        queue = self._queues.get(chat_id)
+        if pending is not None and queue and queue[-1] is pending:
+            pending.kwargs = params
+            future = asyncio.get_running_loop().create_future()
+            pending.futures.append(future)
+            self.coalesced += 1
+            return await future
+
+        job = SendJob('edit_message_text', params, edit_key=key)
+        self._pending_edits[key] = job
+        return await self._enqueue(chat_id, job)
+
+    async def delete_message(self, chat_id: int, message_id: int) -> bool:
+        """Удалить сообщение (по порядку с остальными сообщениями чата)"""
+        return await self._enqueue(chat_id, SendJob(
+            'delete_message', dict(chat_id=chat_id, message_id=message_id)
+        ))
+
+    # Обертки над объектами python-telegram-bot
+
+    async def reply(self, message, text: str, **kwargs) -> Dict[str, Any]:
+        """Ответить в чат сообщения (замена message.reply_text)"""
+        return await self.send_message(message.chat_id, text, **kwargs)
+
+    async def edit(self, message, text: str, **kwargs) -> Optional[Dict[str, Any]]:
+        """Изменить сообщение (замена message.edit_text)"""
+        return await self.edit_message_text(message.chat_id, message.message_id, text, **kwargs)
+
+    async def delete(self, message) -> bool:
+        """Удалить сообщение (замена message.delete)"""
+        return await self.delete_message(message.chat_id, message.message_id)
+
+    async def answer(self, callback_query, text: Optional[str] = None) -> bool:
+        """Ответ на callback не является сообщением и не ждет в очереди"""
+        return await self.client.answer_callback_query(callback_query.id, text)
+
+    async def _enqueue(self, chat_id: int, job: SendJob) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        job.futures.append(future)
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+        queue.append(job)
+        if chat_id not in self._workers:
+            self._workers[chat_id] = asyncio.ensure_future(self._drain(chat_id, queue))
+        return await future
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        now = time.monotonic()
+        cached = self._chat_buckets.get(chat_id)
+        bucket = cached[0] if cached else TokenBucket(rate=self.chat_rate, capacity=self.chat_burst)
+        self._chat_buckets[chat_id] = (bucket, now)
+        if len(self._chat_buckets) > self.MAX_IDLE_BUCKETS:
+            # Корзина, простоявшая дольше времени полного пополнения,
+            # ничем не отличается от новой
+            refill_time = self.chat_burst / self.chat_rate
+            for idle_chat, (_, used) in list(self._chat_buckets.items()):
+                if now - used > refill_time and idle_chat not in self._queues:
+                    del self._chat_buckets[idle_chat]
+        return bucket
+
+    async def _acquire(self, chat_id: int):
+        await self._chat_bucket(chat_id).acquire()
+        await self._global_bucket.acquire()
+
+    async def _drain(self, chat_id: int, queue: Deque[SendJob]):
+        """Отправляет очередь одного чата по порядку"""
+        try:
+            while queue:
+                job = queue[0]
+                await self._acquire(chat_id)
+                # Пока ждали токены, правка могла обновиться; после этого - уже нет
+                queue.popleft()
+                if job.edit_key is not None and self._pending_edits.get(job.edit_key) is job:
+                    del self._pending_edits[job.edit_key]
+                self.max_wait = max(self.max_wait, time.monotonic() - job.queued_at)
+                await self._execute(chat_id, job)
+        finally:
+            del self._workers[chat_id]
+            del self._queues[chat_id]
+
+    async def _execute(self, chat_id: int, job: SendJob):
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await getattr(self.client, job.method)(**job.kwargs)
+            except TelegramAPIError as e:
+                if e.retry_after and attempt < self.max_retries:
+                    self.rate_limited += 1
+                    logger.warning("Telegram rate limit in chat %s, retry after %ss", chat_id, e.retry_after)
+                    self._chat_bucket(chat_id).pause(e.retry_after)
+                    await self._acquire(chat_id)
+                    continue
+                if e.is_transient and attempt < self.max_retries:
+                    delay = self.TRANSIENT_RETRY_DELAY * 2 ** attempt
+                    logger.warning("Telegram call failed in chat %s (%s), retry in %ss", chat_id, e, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self._finish(job, error=e)
+                return
+            except Exception as e:
+                self._finish(job, error=e)
+                return
+            self._finish(job, result=result)
+            return
+
+    def _finish(self, job: SendJob, result: Any = None, error: Optional[Exception] = None):
+        if error is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+        for future in job.futures:
+            # Ожидающий мог быть отменен (например, при остановке)
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Глубина очередей и счетчики отправки"""
+        return {
+            'queued': sum(len(queue) for queue in self._queues.values()),
+            'chats_queued': len(self._queues),
+            'global_waiting': self._global_bucket.waiting,
+            'sent': self.sent,
+            'failed': self.failed,
+            'coalesced_edits': self.coalesced,
+            'rate_limited': self.rate_limited,
+            'max_wait': self.max_wait
+        }
+
+
+outbox = SendScheduler(
+    bot_api,
+    global_rate=settings.TELEGRAM_GLOBAL_RATE_LIMIT,
+    chat_rate=settings.TELEGRAM_CHAT_RATE_LIMIT,
+    chat_burst=settings.TELEGRAM_CHAT_BURST,
+    max_retries=settings.TELEGRAM_SEND_RETRIES
+)
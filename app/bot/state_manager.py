@@ -70,6 +70,18 @@ class StateManager:
         state.forwarded_messages.append(message)
         state.last_activity = datetime.now()
 
+    def add_forwarded_messages(self, user_id: int, messages: List[Dict]):
+        """
+        Добавление пачки пересланных сообщений одним обновлением состояния.
+        
+        Args:
+            user_id: ID пользователя
+            messages: Информация о сообщениях
+        """
+        state = self.get_user_state(user_id)
+        state.forwarded_messages.extend(messages)
+        state.last_activity = datetime.now()
+
     def get_forwarded_messages(self, user_id: int) -> List[Dict]:
         """
         Получение пересланных сообщений.
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+import aiohttp
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class TelegramAPIError(Exception):
+    """Ошибка, которую вернул Bot API"""
+
+    def __init__(self, method: str, error_code: int, description: str,
+                 retry_after: Optional[float] = None):
+        super().__init__(f"{method}: {error_code} {description}")
+        self.error_code = error_code
+        self.description = description
+        self.retry_after = retry_after
+
+    @property
+    def is_transient(self) -> bool:
+        """Сбой сети или сервера: запрос имеет смысл повторить"""
+        return self.error_code == 0 or self.error_code >= 500
+
+
+class TelegramClient:
+    """Асинхронный клиент Telegram Bot API.
+
+    Синхронные методы python-telegram-bot (reply_text, edit_text) блокируют
+    event loop на время HTTP-запроса. Этот клиент ходит в Bot API через
+    общий пул соединений aiohttp и не блокирует обработку других
+    пользователей. Объекты python-telegram-bot используются только как
+    источник chat_id/message_id и разметки.
+    """
+
+    def __init__(self, token: str):
+        self.token = token
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self):
+        """Открывает пул соединений (вызывается при старте приложения)"""
+        await self._get_session()
+
+    async def close(self):
+        """Закрывает пул соединений (вызывается при остановке приложения)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=settings.TELEGRAM_POOL_LIMIT)
+            timeout = aiohttp.ClientTimeout(total=settings.TELEGRAM_REQUEST_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def call(self, method: str, **params) -> Any:
+        """
+        Вызывает метод Bot API.
+
+        Args:
+            method: Имя метода (sendMessage, editMessageText, ...)
+            **params: Параметры; None пропускаются, разметка сериализуется
+
+        Returns:
+            Any: Поле result ответа
+
+        Raises:
+            TelegramAPIError: Bot API вернул ok=false, ответ не является JSON
+                или запрос не дошел (сетевая ошибка, таймаут)
+        """
+        payload = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if hasattr(value, 'to_dict'):
+                value = value.to_dict()
+            payload[name] = value
+
+        session = await self._get_session()
+        url = f"{settings.TELEGRAM_API_URL}/bot{self.token}/{method}"
+        self.requests += 1
+        try:
+            async with session.post(url, json=payload) as response:
+                status = response.status
+                raw = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            # Сетевой сбой: код 0, чтобы отличать от ответов Bot API
+            raise TelegramAPIError(method, 0, f"network error: {e!r}") from e
+
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            self.errors += 1
+            # Например, HTML-страница 502 от прокси
+            raise TelegramAPIError(method, status, f"non-JSON response (HTTP {status})")
+
+        if not isinstance(body, dict) or not body.get('ok'):
+            self.errors += 1
+            body = body if isinstance(body, dict) else {}
+            raise TelegramAPIError(
+                method,
+                body.get('error_code', status),
+                body.get('description', ''),
+                retry_after=(body.get('parameters') or {}).get('retry_after')
+            )
+        return body.get('result')
+
+    async def send_message(self, chat_id: int, text: str, reply_markup=None,
+                           parse_mode: Optional[str] = None,
+                           disable_web_page_preview: Optional[bool] = None) -> Dict[str, Any]:
+        """Отправить сообщение"""
+        return await self.call(
+            'sendMessage',
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+            disable_web_page_preview=disable_web_page_preview
+        )
+
+    async def edit_message_text(self, chat_id: int, message_id: int, text: str, reply_markup=None,
+                                parse_mode: Optional[str] = None,
+                                disable_web_page_preview: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """Изменить текст сообщения"""
+        try:
+            return await self.call(
+                'editMessageText',
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+                disable_web_page_preview=disable_web_page_preview
+            )
+        except TelegramAPIError as e:
+            # Повторное нажатие той же кнопки - не ошибка
+            if 'message is not modified' in e.description:
+                return None
+            raise
+
+    async def delete_message(self, chat_id: int, message_id: int) -> bool:
+        """Удалить сообщение"""
+        return await self.call('deleteMessage', chat_id=chat_id, message_id=message_id)
+
+    async def answer_callback_query(self, callback_query_id: str, text: Optional[str] = None) -> bool:
+        """Ответить на нажатие инлайн-кнопки"""
+        return await self.call('answerCallbackQuery', callback_query_id=callback_query_id, text=text)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors
+        }
+
+
+bot_api = TelegramClient(settings.TELEGRAM_BOT_TOKEN)
@@ -26,6 +26,23 @@ class Settings(BaseSettings):
     # Настройки Telegram
     TELEGRAM_BOT_TOKEN: str  # Обязательное поле
     TELEGRAM_WEBHOOK_URL: Optional[str] = None
+    TELEGRAM_WORKER_CONCURRENCY: int = 16  # Обновлений, обрабатываемых одновременно
+    TELEGRAM_MAX_PENDING_UPDATES: int = 1000  # Больше в очереди - 503, Telegram повторит позже
+    TELEGRAM_SHUTDOWN_TIMEOUT: float = 10.0  # Сколько ждать очередь при остановке (сек)
+    TELEGRAM_DEDUP_WINDOW: int = 10000  # Сколько последних update_id помнить
+    TELEGRAM_DEDUP_TTL: int = 3600  # Срок хранения update_id в общем хранилище (сек)
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    TELEGRAM_POOL_LIMIT: int = 100  # Соединений к Bot API
+    TELEGRAM_REQUEST_TIMEOUT: float = 15.0  # Таймаут вызова Bot API (сек)
+    TELEGRAM_GLOBAL_RATE_LIMIT: float = 30.0  # Сообщений в секунду на весь бот
+    TELEGRAM_CHAT_RATE_LIMIT: float = 1.0  # Сообщений в секунду в один чат
+    TELEGRAM_CHAT_BURST: int = 3  # Допустимый всплеск сообщений в один чат
+    TELEGRAM_SEND_RETRIES: int = 3  # Повторов после 429 с retry_after
+    TELEGRAM_FORWARD_QUIET_WINDOW: float = 1.0  # Пауза, после которой пачка пересылок обрабатывается (сек)
+    TELEGRAM_FORWARD_MAX_DELAY: float = 5.0  # Дольше пачку не копим, даже если пересылки продолжаются (сек)
+    
+    # Общее хранилище (Redis); без него дедупликация работает в пределах процесса
+    REDIS_URL: Optional[str] = None
     
     # Настройки OpenAI
     OPENAI_API_KEY: Optional[str] = None
@@ -33,6 +50,56 @@ class Settings(BaseSettings):
     # Настройки Trello
     TRELLO_API_KEY: Optional[str] = None  # Теперь опциональное поле
     TRELLO_TOKEN: Optional[str] = None  # Токен будет передаваться пользователем через бота
+    TRELLO_API_SECRET: Optional[str] = None  # Секрет приложения для проверки подписи вебхуков
+    TRELLO_WEBHOOK_URL: Optional[str] = None  # По умолчанию {APP_URL}/trello/webhook
+    TRELLO_DELTA_MAX_ACTIONS: int = 1000  # Больше действий с прошлой синхронизации - полная синхронизация
+    TRELLO_DELTA_MAX_AGE_DAYS: int = 7  # Старше - полная синхронизация
+    TRELLO_MIRROR_MAX_AGE: int = 300  # Старше (сек) - /boards запускает фоновую синхронизацию
+    
+    # Пул HTTP-соединений к Trello
+    TRELLO_POOL_LIMIT: int = 100  # Всего соединений в пуле
+    TRELLO_POOL_LIMIT_PER_HOST: int = 30  # Соединений к одному хосту
+    TRELLO_DNS_CACHE_TTL: int = 300  # Секунды
+    TRELLO_KEEPALIVE_TIMEOUT: float = 30.0  # Секунды простоя до закрытия соединения
+    TRELLO_CONNECT_TIMEOUT: float = 5.0  # Секунды
+    TRELLO_REQUEST_TIMEOUT: float = 30.0  # Секунды на весь запрос
+    TRELLO_READ_TIMEOUT: float = 10.0  # Секунды на чтение одного объекта
+    TRELLO_WRITE_TIMEOUT: float = 15.0  # Секунды на изменяющий запрос
+    TRELLO_BULK_TIMEOUT: float = 30.0  # Секунды на тяжелые выборки (/batch, все карточки доски)
+    TRELLO_BOARD_CONCURRENCY: int = 8  # Досок, загружаемых параллельно
+    
+    # Клиенты Trello пользователей
+    TRELLO_CLIENT_REGISTRY_SIZE: int = 500  # Максимум клиентов в памяти
+    TRELLO_CLIENT_IDLE_TTL: float = 1800.0  # Секунды простоя до вытеснения клиента
+    TRELLO_USER_TOKEN_TTL: float = 300.0  # Секунды кэширования токена пользователя из БД
+    
+    # Лимиты Trello API (запросов за окно)
+    TRELLO_KEY_RATE_LIMIT: int = 300  # На API ключ
+    TRELLO_TOKEN_RATE_LIMIT: int = 100  # На токен пользователя
+    TRELLO_RATE_LIMIT_WINDOW: float = 10.0  # Секунды
+    TRELLO_RATE_LIMIT_RETRIES: int = 5  # Повторов после ответа 429
+    
+    # Повторы и защита от деградации Trello
+    TRELLO_RETRY_ATTEMPTS: int = 3  # Повторов идемпотентного запроса после сбоя
+    TRELLO_RETRY_BASE_DELAY: float = 0.5  # Секунды, база экспоненциальной задержки
+    TRELLO_RETRY_MAX_DELAY: float = 8.0  # Секунды, максимум задержки
+    TRELLO_BREAKER_FAILURE_THRESHOLD: int = 5  # Сбоев подряд до размыкания
+    TRELLO_BREAKER_RECOVERY_TIMEOUT: float = 30.0  # Секунды до пробного запроса
+    
+    # Логирование запросов к Trello
+    TRELLO_LOG_SAMPLE_RATE: float = 0.01  # Доля успешных запросов, попадающих в INFO
+    TRELLO_SLOW_REQUEST_MS: float = 1000.0  # Порог медленного запроса (всегда логируется)
+    TRELLO_BATCH_WINDOW: float = 0.02  # Секунды на сбор GET-запросов в один /batch
+    TRELLO_LABEL_CACHE_TTL: float = 300.0  # Секунды жизни индекса меток доски
+    TRELLO_MEMBER_CACHE_TTL: float = 600.0  # Секунды жизни справочника участников доски
+    TRELLO_CHECKLIST_CONCURRENCY: int = 5  # Пунктов чек-листа, добавляемых параллельно
+    TRELLO_BULK_CONCURRENCY: int = 4  # Карточек, создаваемых параллельно при массовом создании
+    TRELLO_STREAM_CHUNK_SIZE: int = 64 * 1024  # Байт за чтение при потоковой загрузке
+    
+    # Кэш ответов Trello
+    TRELLO_CACHE_MAX_ENTRIES: int = 2000
+    TRELLO_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    TRELLO_CACHE_STALE_TTL: float = 300.0  # Секунды, в течение которых отдаются устаревшие данные
     
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = []
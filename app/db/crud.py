@@ -1,6 +1,6 @@
 # app/db/crud.py
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func
 from sqlalchemy.orm import joinedload
 from typing import List, Optional
 from datetime import datetime
@@ -31,6 +31,25 @@ class BoardCRUD:
         result = await self.session.execute(query)
         return result.scalars().all()
         
+    async def get_summaries(self) -> List[dict]:
+        """Доски с числом списков и карточек (один агрегирующий запрос)"""
+        query = (
+            select(
+                Board.trello_id,
+                Board.name,
+                Board.description,
+                Board.last_synced,
+                func.count(func.distinct(List.id)).label('lists_count'),
+                func.count(Card.id).label('cards_count')
+            )
+            .outerjoin(List, List.board_id == Board.id)
+            .outerjoin(Card, Card.list_id == List.id)
+            .group_by(Board.id)
+            .order_by(Board.name)
+        )
+        result = await self.session.execute(query)
+        return [dict(row._mapping) for row in result]
+        
     async def update(self, board_id: str, **kwargs) -> Optional[Board]:
         query = update(Board).where(Board.id == board_id).values(**kwargs)
         await self.session.execute(query)
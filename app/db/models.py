@@ -3,31 +3,42 @@ from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import uuid
 
 Base = declarative_base()
 
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
 class Board(Base):
     __tablename__ = 'boards'
     
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True, default=_new_id)
     trello_id = Column(String, unique=True)
     name = Column(String)
     description = Column(String)
     last_synced = Column(DateTime, default=datetime.utcnow)
-    metadata = Column(JSON)
+    # Последнее примененное действие Trello (точка отсчета для дельта-синхронизации)
+    last_action_id = Column(String)
+    last_action_date = Column(DateTime)
+    # Последняя полная синхронизация: дельта не исправляет расхождения, поэтому
+    # раз в TRELLO_DELTA_MAX_AGE_DAYS доска выгружается целиком
+    last_full_sync = Column(DateTime)
+    # Имя metadata зарезервировано декларативной базой SQLAlchemy
+    meta = Column('metadata', JSON)
     
     lists = relationship("List", back_populates="board")
 
 class List(Base):
     __tablename__ = 'lists'
     
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True, default=_new_id)
     trello_id = Column(String, unique=True)
     board_id = Column(String, ForeignKey('boards.id'))
     name = Column(String)
     position = Column(Integer)
     last_synced = Column(DateTime, default=datetime.utcnow)
-    metadata = Column(JSON)
+    meta = Column('metadata', JSON)
     
     board = relationship("Board", back_populates="lists")
     cards = relationship("Card", back_populates="list")
@@ -35,7 +46,7 @@ class List(Base):
 class Card(Base):
     __tablename__ = 'cards'
     
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True, default=_new_id)
     trello_id = Column(String, unique=True)
     list_id = Column(String, ForeignKey('lists.id'))
     name = Column(String)
@@ -45,6 +56,6 @@ class Card(Base):
     members = Column(JSON)
     position = Column(Integer)
     last_synced = Column(DateTime, default=datetime.utcnow)
-    metadata = Column(JSON)
+    meta = Column('metadata', JSON)
     
     list = relationship("List", back_populates="cards")
\ No newline at end of file
@@ -1,9 +1,14 @@
 # app/db/session.py
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy import inspect, text
 from app.config import get_settings
+from app.db.models import Base
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
 # Создаем директорию для базы данных если её нет
@@ -28,4 +33,34 @@ async_session = sessionmaker(
 # Функция для получения сессии
 async def get_session() -> AsyncSession:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def init_db() -> bool:
+    """
+    Создает таблицы локального зеркала Trello и недостающие в них колонки.
+    
+    Returns:
+        bool: True, если зеркало готово к работе
+    """
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_add_missing_columns)
+        return True
+    except Exception as e:
+        logger.error(f"Error initializing the local database: {e}", exc_info=True)
+        return False
+
+def _add_missing_columns(conn):
+    """create_all не меняет существующие таблицы: новые колонки добавляем сами"""
+    inspector = inspect(conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"
+                ))
+                logger.info("Added column %s.%s", table.name, column.name)
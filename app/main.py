@@ -1,5 +1,14 @@
+import asyncio
+from typing import Optional
 from fastapi import FastAPI, Request
-from app.bot.handlers import router as bot_router
+from app.bot.handlers import router as bot_router, update_dispatcher, forward_collector
+from app.bot.dedup import update_dedup
+from app.bot.telegram_client import bot_api
+from app.bot.send_queue import outbox
+from app.trello.registry import trello_clients
+from app.services.board_summary import board_summary
+from app.trello.webhooks import router as trello_router, register_all_board_webhooks
+from app.db.session import init_db
 from app.core.config import settings
 import logging
 
@@ -9,14 +18,61 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
+# Фоновая регистрация вебхуков Trello (ссылка не дает задаче пропасть до завершения)
+_webhook_registration: Optional[asyncio.Task] = None
+
 # Добавляем роутер для вебхуков
 app.include_router(bot_router)
+app.include_router(trello_router)
+
+@app.on_event("startup")
+async def on_startup():
+    global _webhook_registration
+    # Таблицы зеркала Trello нужны вебхукам и синхронизации; пока их нет,
+    # /boards отвечает напрямую из Trello
+    board_summary.mirror_ready = await init_db()
+    # Открываем пул соединений к Trello один раз на все время работы
+    await trello_clients.start()
+    await bot_api.start()
+    await update_dispatcher.start()
+    # Регистрация вебхуков Trello не должна задерживать старт
+    _webhook_registration = asyncio.ensure_future(register_all_board_webhooks())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if _webhook_registration is not None and not _webhook_registration.done():
+        _webhook_registration.cancel()
+    # Сначала дорабатываем принятые обновления, им еще нужен Trello.
+    # Они могут добавить пересылки в буфер, а пересылки уже подтверждены
+    # Telegram: обрабатываем их до закрытия клиентов
+    await update_dispatcher.stop()
+    await forward_collector.flush_all()
+    await trello_clients.close()
+    await bot_api.close()
+    await update_dedup.close()
 
 # Эндпоинт для проверки работоспособности
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+# Метрики внутренних очередей и кэшей
+@app.get("/metrics")
+async def metrics():
+    return {
+        "updates": {
+            **update_dispatcher.get_stats(),
+            "dedup": update_dedup.get_stats(),
+            "forwards": forward_collector.get_stats()
+        },
+        "telegram": {
+            **bot_api.get_stats(),
+            "outbox": outbox.get_stats()
+        },
+        "trello": trello_clients.get_stats(),
+        "boards": board_summary.get_stats()
+    }
+
 # Эндпоинт для предотвращения засыпания
 @app.get("/")
 async def keep_alive():
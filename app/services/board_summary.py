@@ -0,0 +1,107 @@
+# app/services/board_summary.py
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from app.config import get_settings
+from app.db.session import async_session
+from app.trello.client import TrelloClient
+from app.trello.registry import trello_clients
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class BoardSummaryService:
+    """Сводка по доскам для /boards из локального зеркала.
+
+    Зеркало заполняется синхронизацией с глобальным токеном, поэтому
+    из него отвечаем только клиенту по умолчанию и только после того,
+    как его таблицы созданы (mirror_ready). Если данные старше
+    max_age, в фоне запускается синхронизация (не больше одной за раз),
+    а пользователь сразу получает то, что уже есть в БД.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = timedelta(seconds=max_age)
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Выставляется при старте приложения по результату init_db()
+        self.mirror_ready = False
+        self.mirror_hits = 0
+        self.live_fallbacks = 0
+
+    async def get_summaries(self, trello_client: TrelloClient) -> List[Dict[str, Any]]:
+        """
+        Доски с числом списков и карточек.
+
+        Args:
+            trello_client: Клиент пользователя
+
+        Returns:
+            List[Dict[str, Any]]: id, name, desc, url, lists_count, cards_count
+        """
+        if trello_client is not trello_clients.default_client or not self.mirror_ready:
+            self.live_fallbacks += 1
+            return await trello_client.get_boards_summary()
+
+        try:
+            from app.db.crud import BoardCRUD
+
+            async with async_session() as session:
+                rows = await BoardCRUD(session).get_summaries()
+        except Exception as e:
+            # Зеркало недоступно: /boards все равно должен работать
+            logger.error(f"Error reading board mirror: {e}")
+            self.live_fallbacks += 1
+            return await trello_client.get_boards_summary()
+
+        if not rows:
+            # Зеркало еще пустое: отвечаем из Trello и заполняем его в фоне
+            self._schedule_refresh()
+            self.live_fallbacks += 1
+            return await trello_client.get_boards_summary()
+
+        synced = [row['last_synced'] for row in rows if row['last_synced']]
+        if not synced or datetime.utcnow() - min(synced) > self.max_age:
+            self._schedule_refresh()
+
+        self.mirror_hits += 1
+        return [
+            {
+                'id': row['trello_id'],
+                'name': row['name'],
+                'desc': row['description'] or '',
+                'url': f"https://trello.com/b/{row['trello_id']}",
+                'lists_count': row['lists_count'],
+                'cards_count': row['cards_count']
+            }
+            for row in rows
+        ]
+
+    def _schedule_refresh(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def _refresh(self):
+        # Сервис синхронизации тянет модели БД и Redis, импортируем по требованию
+        from app.services.sync_service import TrelloSyncService
+
+        try:
+            async with async_session() as session:
+                await TrelloSyncService(session, trello_clients.default_client).sync_all()
+        except Exception as e:
+            logger.error(f"Error refreshing board mirror: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики сводки по доскам"""
+        return {
+            'mirror_ready': self.mirror_ready,
+            'mirror_hits': self.mirror_hits,
+            'live_fallbacks': self.live_fallbacks,
+            'refreshing': self._refresh_task is not None and not self._refresh_task.done()
+        }
+
+
+board_summary = BoardSummaryService(max_age=settings.TRELLO_MIRROR_MAX_AGE)
@@ -1,37 +1,135 @@
 # app/services/sync_service.py
-import redis
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
 from app.db.models import Board, List, Card
 from app.config import get_settings
+from app.trello.cache import response_cache
+from app.trello.client import TrelloUnavailableError
+
+try:
+    import redis
+except ImportError:
+    redis = None
 
 settings = get_settings()
-redis_client = redis.from_url(settings.REDIS_URL)
+_redis_client = None
+
+
+def _get_redis():
+    """Клиент Redis, создается при первом обращении; None, если Redis не настроен"""
+    global _redis_client
+    if _redis_client is None and settings.REDIS_URL and redis is not None:
+        _redis_client = redis.from_url(settings.REDIS_URL)
+    return _redis_client
 
 class TrelloSyncService:
     def __init__(self, db_session: AsyncSession, trello_client):
         self.db = db_session
         self.trello = trello_client
         
-    async def sync_all(self):
-        """Полная синхронизация данных с Trello"""
-        boards = await self.trello.get_boards_with_details()
+    async def sync_all(self, delta: bool = True):
+        """Синхронизация всех досок с Trello
+        
+        Args:
+            delta: Применять только изменения с прошлой синхронизации,
+                где это возможно
+        """
+        boards = await self.trello.get_boards(preset='sync')
         for board in boards:
-            await self.sync_board(board)
+            if delta:
+                await self.sync_board_delta(board)
+            else:
+                await self.sync_board(board)
+                
+    async def sync_board_delta(self, board_data) -> bool:
+        """
+        Дельта-синхронизация доски по ленте действий.
+        
+        Читает действия после сохраненной отметки и применяет только их.
+        Если отметки нет, действий слишком много или полная синхронизация
+        была давно, выполняется полная синхронизация.
+        
+        Returns:
+            bool: True, если применена дельта, False - если была полная синхронизация
+        """
+        board = await self._get_by_trello_id(Board, board_data['id'])
+        max_age = timedelta(days=settings.TRELLO_DELTA_MAX_AGE_DAYS)
+        if (not board or not board.last_action_id
+                or not board.last_full_sync or datetime.utcnow() - board.last_full_sync > max_age):
+            await self.sync_board(board_data)
+            return False
+            
+        actions = await self.trello.get_board_actions(
+            board.trello_id,
+            since=board.last_action_id,
+            limit=settings.TRELLO_DELTA_MAX_ACTIONS,
+            action_types=list(self.ACTION_HANDLERS)
+        )
+        if isinstance(actions, dict) or len(actions) >= settings.TRELLO_DELTA_MAX_ACTIONS:
+            # Разрыв слишком большой (или лента недоступна): дельта может быть неполной
+            await self.sync_board(board_data)
+            return False
+            
+        # Название и описание доски приходят в board_data, а не в ленте
+        board = await self._update_board(board_data)
+        
+        # Лента отдается от новых к старым, применяем в хронологическом порядке
+        for action in reversed(actions):
+            await self.apply_action(action)
+            
+        if actions:
+            self._set_high_water_mark(board, actions[0])
+        board.last_synced = datetime.utcnow()
+        await self.db.commit()
+        return True
+        
+    def _set_high_water_mark(self, board, action: Dict[str, Any]):
+        board.last_action_id = action['id']
+        board.last_action_date = _parse_date(action.get('date'))
             
     async def sync_board(self, board_data):
-        """Синхронизация доски"""
+        """Полная синхронизация доски
+        
+        Списки и карточки, которых больше нет в Trello (удалены, в архиве
+        или перенесены на другую доску), удаляются из зеркала.
+        """
+        # Отметку берем до выгрузки: изменения, сделанные во время
+        # синхронизации, будут применены следующей дельтой
+        latest_actions = await self.trello.get_board_actions(board_data['id'], limit=1)
+        started = datetime.utcnow()
+        
         board = await self._update_board(board_data)
-        lists = await self.trello.get_board_lists(board.trello_id)
+        lists = await self.trello.get_board_lists(board.trello_id, preset='sync')
         
+        list_ids = {}
         for list_data in lists:
             list_obj = await self._update_list(list_data, board.id)
-            cards = await self.trello.get_list_cards(list_data['id'])
+            list_ids[list_data['id']] = list_obj.id
             
-            for card_data in cards:
-                await self._update_card(card_data, list_obj.id)
+        # Карточки всей доски читаются потоком, по одной за раз
+        async for card_data in self.trello.stream_board_cards(board.trello_id):
+            list_id = list_ids.get(card_data.get('idList'))
+            if list_id:
+                await self._update_card(card_data, list_id)
+                
+        await self._prune_board(board, started)
+        if isinstance(latest_actions, list) and latest_actions:
+            self._set_high_water_mark(board, latest_actions[0])
+        board.last_full_sync = started
+        await self.db.commit()
+        
+    async def _prune_board(self, board, synced_since: datetime):
+        """Удаляет списки и карточки доски, не обновленные синхронизацией"""
+        board_lists = select(List.id).where(List.board_id == board.id)
+        await self.db.execute(
+            delete(Card).where(Card.list_id.in_(board_lists), Card.last_synced < synced_since)
+        )
+        await self.db.execute(
+            delete(List).where(List.board_id == board.id, List.last_synced < synced_since)
+        )
                 
     async def _update_board(self, data):
         """Обновление/создание доски в БД"""
@@ -44,13 +142,13 @@ class TrelloSyncService:
                 trello_id=data['id'],
                 name=data['name'],
                 description=data.get('desc', ''),
-                metadata=data
+                meta=data
             )
             self.db.add(board)
         else:
             board.name = data['name']
             board.description = data.get('desc', '')
-            board.metadata = data
+            board.meta = data
             board.last_synced = datetime.utcnow()
             
         await self.db.commit()
@@ -68,13 +166,13 @@ class TrelloSyncService:
                 board_id=board_id,
                 name=data['name'],
                 position=data.get('pos', 0),
-                metadata=data
+                meta=data
             )
             self.db.add(list_obj)
         else:
             list_obj.name = data['name']
             list_obj.position = data.get('pos', 0)
-            list_obj.metadata = data
+            list_obj.meta = data
             list_obj.last_synced = datetime.utcnow()
             
         await self.db.commit()
@@ -92,33 +190,280 @@ class TrelloSyncService:
                 list_id=list_id,
                 name=data['name'],
                 description=data.get('desc', ''),
-                due_date=data.get('due'),
+                due_date=_parse_date(data.get('due')),
                 labels=data.get('labels', []),
                 members=data.get('idMembers', []),
                 position=data.get('pos', 0),
-                metadata=data
+                meta=data
             )
             self.db.add(card)
         else:
+            card.list_id = list_id
             card.name = data['name']
             card.description = data.get('desc', '')
-            card.due_date = data.get('due')
+            card.due_date = _parse_date(data.get('due'))
             card.labels = data.get('labels', [])
             card.members = data.get('idMembers', [])
             card.position = data.get('pos', 0)
-            card.metadata = data
+            card.meta = data
             card.last_synced = datetime.utcnow()
             
         await self.db.commit()
         return card
         
+    async def apply_action(self, action: Dict[str, Any]) -> bool:
+        """
+        Применяет одно действие Trello (из вебхука или ленты действий)
+        к локальному зеркалу и сбрасывает связанные записи кэша.
+        
+        Args:
+            action: Действие Trello ('type', 'data', 'date', ...)
+            
+        Returns:
+            bool: True, если тип действия поддерживается
+        """
+        handler = self.ACTION_HANDLERS.get(action.get('type'))
+        if handler is None:
+            return False
+            
+        data = action.get('data', {})
+        await handler(self, data)
+        await self.db.commit()
+        self._invalidate_for_action(data)
+        return True
+        
+    def _invalidate_for_action(self, data: Dict[str, Any]):
+        """Сбрасывает кэш ответов по объектам, затронутым действием"""
+        if data.get('card'):
+            response_cache.invalidate(None, f"cards/{data['card']['id']}")
+        for key in ('list', 'listBefore', 'listAfter'):
+            if data.get(key):
+                response_cache.invalidate(None, f"lists/{data[key]['id']}")
+        for key in ('boardSource', 'boardTarget'):
+            if data.get(key):
+                response_cache.invalidate(None, f"boards/{data[key]['id']}")
+        if data.get('board'):
+            response_cache.invalidate(None, f"boards/{data['board']['id']}")
+            if data.get('label'):
+                self.trello.invalidate_labels(data['board']['id'])
+                
+    async def _get_by_trello_id(self, model, trello_id: Optional[str]):
+        if not trello_id:
+            return None
+        result = await self.db.execute(select(model).where(model.trello_id == trello_id))
+        return result.scalar_one_or_none()
+        
+    async def _on_create_card(self, data):
+        list_obj = await self._get_by_trello_id(List, data.get('list', {}).get('id'))
+        if not list_obj:
+            return
+        if await self._get_by_trello_id(Card, data['card']['id']):
+            # Карточка уже в зеркале (например, действие повторяется после
+            # полной синхронизации): в действии только id и название,
+            # перезаписывать ими полные данные нельзя
+            return
+            
+        # Действие содержит минимум полей; для копии важно и содержимое
+        card_data = data['card']
+        try:
+            full_card = await self.trello.get_card(card_data['id'], preset='sync')
+            if isinstance(full_card, dict) and 'error' not in full_card:
+                card_data = full_card
+        except TrelloUnavailableError:
+            pass
+        await self._update_card({**card_data, 'idList': list_obj.trello_id}, list_obj.id)
+            
+    async def _on_update_card(self, data):
+        card = await self._get_by_trello_id(Card, data['card']['id'])
+        changed = data['card']
+        old = data.get('old', {})
+        if not card:
+            if 'closed' in old and not changed.get('closed'):
+                # Карточка возвращена из архива: загружаем ее как новую
+                await self._on_create_card(data)
+            # Иначе ее нет в зеркале: она появится при следующей синхронизации
+            return
+        
+        if changed.get('closed'):
+            await self.db.delete(card)
+            return
+        if 'name' in old:
+            card.name = changed.get('name')
+        if 'desc' in old:
+            card.description = changed.get('desc', '')
+        if 'due' in old:
+            card.due_date = _parse_date(changed.get('due'))
+        if 'pos' in old:
+            card.position = changed.get('pos', 0)
+        if 'idList' in old and data.get('listAfter'):
+            list_obj = await self._get_by_trello_id(List, data['listAfter']['id'])
+            if list_obj:
+                card.list_id = list_obj.id
+            else:
+                await self.db.delete(card)
+                return
+        card.last_synced = datetime.utcnow()
+        
+    async def _on_delete_card(self, data):
+        await self.db.execute(delete(Card).where(Card.trello_id == data['card']['id']))
+        
+    async def _on_move_card_to_board(self, data):
+        card = await self._get_by_trello_id(Card, data['card']['id'])
+        list_obj = await self._get_by_trello_id(List, data.get('list', {}).get('id'))
+        if not card:
+            await self._on_create_card(data)
+        elif list_obj:
+            card.list_id = list_obj.id
+            card.last_synced = datetime.utcnow()
+        else:
+            # Доска назначения не зеркалируется
+            await self.db.delete(card)
+            
+    async def _on_move_card_from_board(self, data):
+        card = await self._get_by_trello_id(Card, data['card']['id'])
+        # Если действие доски назначения уже применено, карточка на месте
+        if card and await self._list_board_trello_id(card.list_id) == data.get('board', {}).get('id'):
+            await self.db.delete(card)
+            
+    async def _list_board_trello_id(self, list_id: str) -> Optional[str]:
+        result = await self.db.execute(
+            select(Board.trello_id).join(List, List.board_id == Board.id).where(List.id == list_id)
+        )
+        return result.scalar_one_or_none()
+        
+    async def _on_card_label(self, data, added: bool):
+        card = await self._get_by_trello_id(Card, data['card']['id'])
+        if not card:
+            return
+        label = data['label']
+        labels = [l for l in (card.labels or []) if l.get('id') != label['id']]
+        if added:
+            labels.append(label)
+        # JSON-колонка отслеживается только при присваивании нового значения
+        card.labels = labels
+        card.last_synced = datetime.utcnow()
+        
+    async def _on_card_member(self, data, added: bool):
+        card = await self._get_by_trello_id(Card, data['card']['id'])
+        if not card:
+            return
+        member_id = data.get('idMember') or data.get('member', {}).get('id')
+        members = [m for m in (card.members or []) if m != member_id]
+        if added:
+            members.append(member_id)
+        card.members = members
+        card.last_synced = datetime.utcnow()
+        
+    async def _on_create_list(self, data):
+        board = await self._get_by_trello_id(Board, data.get('board', {}).get('id'))
+        if board:
+            await self._update_list(data['list'], board.id)
+            
+    async def _on_update_list(self, data):
+        list_obj = await self._get_by_trello_id(List, data['list']['id'])
+        if not list_obj:
+            return
+        changed = data['list']
+        old = data.get('old', {})
+        
+        if changed.get('closed'):
+            await self._delete_list(list_obj)
+            return
+        if 'name' in old:
+            list_obj.name = changed.get('name')
+        if 'pos' in old:
+            list_obj.position = changed.get('pos', 0)
+        list_obj.last_synced = datetime.utcnow()
+        
+    async def _delete_list(self, list_obj):
+        await self.db.execute(delete(Card).where(Card.list_id == list_obj.id))
+        await self.db.delete(list_obj)
+        
+    async def _on_move_list_to_board(self, data):
+        board = await self._get_by_trello_id(Board, data.get('board', {}).get('id'))
+        if not board:
+            # Доска назначения не зеркалируется: список удалит действие исходной доски
+            return
+        list_obj = await self._get_by_trello_id(List, data['list']['id'])
+        if list_obj:
+            list_obj.board_id = board.id
+            list_obj.last_synced = datetime.utcnow()
+            return
+            
+        # Списка в зеркале нет, значит, нет и его карточек
+        list_obj = await self._update_list(data['list'], board.id)
+        cards = await self.trello.get_list_cards(list_obj.trello_id, preset='sync')
+        if isinstance(cards, list):
+            for card_data in cards:
+                await self._update_card(card_data, list_obj.id)
+                
+    async def _on_move_list_from_board(self, data):
+        list_obj = await self._get_by_trello_id(List, data['list']['id'])
+        board = await self._get_by_trello_id(Board, data.get('board', {}).get('id'))
+        # Если действие доски назначения уже применено, список на месте
+        if list_obj and board and list_obj.board_id == board.id:
+            await self._delete_list(list_obj)
+        
+    async def _on_board_label(self, data, deleted: bool = False):
+        """Переименование или удаление метки меняет метки карточек доски"""
+        board = await self._get_by_trello_id(Board, data.get('board', {}).get('id'))
+        if not board:
+            return
+        label = data['label']
+        query = select(Card).join(List, Card.list_id == List.id).where(List.board_id == board.id)
+        result = await self.db.execute(query)
+        for card in result.scalars().all():
+            if not any(l.get('id') == label['id'] for l in (card.labels or [])):
+                continue
+            if deleted:
+                card.labels = [l for l in card.labels if l.get('id') != label['id']]
+            else:
+                card.labels = [{**l, **label} if l.get('id') == label['id'] else l
+                               for l in card.labels]
+                               
+    async def _on_noop(self, data):
+        """Действие влияет только на кэш (например, новая метка доски)"""
+        
+    ACTION_HANDLERS = {
+        'createCard': _on_create_card,
+        'copyCard': _on_create_card,
+        'convertToCardFromCheckItem': _on_create_card,
+        'updateCard': _on_update_card,
+        'deleteCard': _on_delete_card,
+        'moveCardToBoard': _on_move_card_to_board,
+        'moveCardFromBoard': _on_move_card_from_board,
+        'addLabelToCard': lambda self, data: self._on_card_label(data, added=True),
+        'removeLabelFromCard': lambda self, data: self._on_card_label(data, added=False),
+        'addMemberToCard': lambda self, data: self._on_card_member(data, added=True),
+        'removeMemberFromCard': lambda self, data: self._on_card_member(data, added=False),
+        'createList': _on_create_list,
+        'updateList': _on_update_list,
+        'moveListToBoard': _on_move_list_to_board,
+        'moveListFromBoard': _on_move_list_from_board,
+        'createLabel': _on_noop,
+        'updateLabel': lambda self, data: self._on_board_label(data),
+        'deleteLabel': lambda self, data: self._on_board_label(data, deleted=True),
+    }
+        
     def cache_board_data(self, board_id: str, data: dict):
         """Кэширование данных доски в Redis"""
+        client = _get_redis()
+        if client is None:
+            return
         key = f"board:{board_id}"
-        redis_client.setex(key, timedelta(hours=1), json.dumps(data))
+        client.setex(key, timedelta(hours=1), json.dumps(data))
         
     def get_cached_board(self, board_id: str) -> dict:
         """Получение кэшированных данных доски"""
+        client = _get_redis()
+        if client is None:
+            return None
         key = f"board:{board_id}"
-        data = redis_client.get(key)
-        return json.loads(data) if data else None
\ No newline at end of file
+        data = client.get(key)
+        return json.loads(data) if data else None
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Разбирает дату Trello в формате ISO 8601"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
\ No newline at end of file
@@ -0,0 +1,158 @@
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from app.config import get_settings
+
+settings = get_settings()
+
+# Время жизни ответов по типам эндпоинтов (секунды)
+CACHE_TTLS = [
+    (re.compile(r'^boards/[^/]+$'), 60.0),
+    (re.compile(r'^boards/[^/]+/lists$'), 30.0),
+    (re.compile(r'^lists/[^/]+$'), 30.0),
+    (re.compile(r'^lists/[^/]+/cards$'), 15.0),
+    (re.compile(r'^cards/[^/]+$'), 15.0),
+]
+
+
+def get_cache_ttl(endpoint: str) -> Optional[float]:
+    """Возвращает TTL для эндпоинта или None, если он не кэшируется"""
+    for pattern, ttl in CACHE_TTLS:
+        if pattern.match(endpoint):
+            return ttl
+    return None
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированный ответ Trello"""
+    value: Any
+    size: int
+    fresh_until: float
+    stale_until: float
+
+    @property
+    def marker(self) -> Optional[str]:
+        """dateLastActivity объекта, по которому проверяется актуальность"""
+        if isinstance(self.value, dict):
+            return self.value.get('dateLastActivity')
+        return None
+
+
+class ResponseCache:
+    """LRU-кэш ответов Trello с ограничением по числу записей и объему.
+
+    Ключ записи начинается с пространства имен (хэш токена), затем идет
+    эндпоинт и параметры запроса.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, stale_ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, include_expired: bool = False) -> Optional[CacheEntry]:
+        """
+        Возвращает запись (в том числе устаревшую) или None.
+
+        Args:
+            key: Ключ записи
+            include_expired: Вернуть запись даже после окна устаревания
+                (используется, пока Trello недоступен)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until <= time.monotonic() and not include_expired:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value: Any, size: int, ttl: float):
+        """Сохраняет ответ, вытесняя самые старые записи при переполнении"""
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        now = time.monotonic()
+        self._entries[key] = CacheEntry(
+            value=value,
+            size=size,
+            fresh_until=now + ttl,
+            stale_until=now + ttl + self.stale_ttl
+        )
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def touch(self, key: Hashable, ttl: float):
+        """Продлевает запись, подтвержденную повторной проверкой"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            entry.fresh_until = now + ttl
+            entry.stale_until = now + ttl + self.stale_ttl
+            self.revalidated += 1
+
+    def invalidate(self, namespace: Optional[str] = None, prefix: str = ''):
+        """
+        Удаляет записи пространства имен, эндпоинт которых начинается с prefix.
+
+        Args:
+            namespace: Пространство имен; None - все пространства
+            prefix: Префикс эндпоинта; пустая строка - все эндпоинты
+        """
+        keys = [
+            key for key in self._entries
+            if (namespace is None or key[0] == namespace) and key[1].startswith(prefix)
+        ]
+        for key in keys:
+            self._remove(key)
+
+    def peek(self, namespace: str, endpoint: str) -> List[Any]:
+        """Значения всех записей эндпоинта (с любыми параметрами), не меняя порядок LRU"""
+        return [
+            entry.value for key, entry in self._entries.items()
+            if key[0] == namespace and key[1] == endpoint
+        ]
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и размер кэша"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions
+        }
+
+
+def make_cache_key(namespace: str, endpoint: str, params: Optional[dict]) -> Tuple:
+    """Ключ кэша: пространство имен, эндпоинт и отсортированные параметры"""
+    return (namespace, endpoint, tuple(sorted((params or {}).items())))
+
+
+response_cache = ResponseCache(
+    max_entries=settings.TRELLO_CACHE_MAX_ENTRIES,
+    max_bytes=settings.TRELLO_CACHE_MAX_BYTES,
+    stale_ttl=settings.TRELLO_CACHE_STALE_TTL
+)
@@ -1,95 +1,840 @@
+import asyncio
 import aiohttp
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import random
+import re
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable, Awaitable, AsyncIterator
+from urllib.parse import urlencode
 from app.config import get_settings
+from app.utils.rate_limit import TokenBucket
+from app.utils.json_stream import iter_json_array
+from app.trello.cache import response_cache, get_cache_ttl, make_cache_key
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+class TrelloRateLimiter:
+    """Планировщик запросов к Trello.
+    
+    Держит token bucket на каждый API ключ и на каждый токен пользователя.
+    Запрос, превышающий бюджет, ждет в очереди, а не завершается ошибкой.
+    """
+    
+    def __init__(self, key_limit: int, token_limit: int, window: float):
+        self.key_limit = key_limit
+        self.token_limit = token_limit
+        self.window = window
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        
+    @staticmethod
+    def _bucket_id(kind: str, secret: Optional[str]) -> Tuple[str, str]:
+        # Храним только хэш, чтобы ключи и токены не попадали в метрики
+        return (kind, hashlib.sha256((secret or '').encode()).hexdigest()[:12])
+        
+    def _bucket(self, kind: str, secret: Optional[str]) -> TokenBucket:
+        bucket_id = self._bucket_id(kind, secret)
+        bucket = self._buckets.get(bucket_id)
+        if bucket is None:
+            limit = self.key_limit if kind == 'key' else self.token_limit
+            bucket = TokenBucket(rate=limit / self.window, capacity=limit)
+            self._buckets[bucket_id] = bucket
+        return bucket
+        
+    async def acquire(self, key: Optional[str], token: Optional[str]) -> float:
+        """Дожидается бюджета по токену и по ключу, возвращает время ожидания"""
+        waited = await self._bucket('token', token).acquire()
+        waited += await self._bucket('key', key).acquire()
+        self.requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+        
+    def forget_token(self, token: Optional[str]):
+        """Удаляет корзину токена, если ее никто не ждет (клиент вытеснен)"""
+        bucket_id = self._bucket_id('token', token)
+        bucket = self._buckets.get(bucket_id)
+        if bucket is not None and not bucket.waiting:
+            del self._buckets[bucket_id]
+        
+    def pause(self, key: Optional[str], token: Optional[str], seconds: float):
+        """Приостанавливает запросы после ответа 429"""
+        self.throttled += 1
+        self._bucket('token', token).pause(seconds)
+        self._bucket('key', key).pause(seconds)
+        
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очереди и время ожидания"""
+        return {
+            'queue_depth': sum(bucket.waiting for bucket in self._buckets.values()),
+            'buckets': len(self._buckets),
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'avg_wait': self.total_wait / self.requests if self.requests else 0.0,
+            'max_wait': self.max_wait
+        }
+
+rate_limiter = TrelloRateLimiter(
+    key_limit=settings.TRELLO_KEY_RATE_LIMIT,
+    token_limit=settings.TRELLO_TOKEN_RATE_LIMIT,
+    window=settings.TRELLO_RATE_LIMIT_WINDOW
+)
+
+class TrelloUnavailableError(Exception):
+    """Trello недоступен: предохранитель разомкнут"""
+
+class TrelloServerError(Exception):
+    """Ответ Trello с кодом 5xx"""
+    
+    def __init__(self, status: int, body: str):
+        super().__init__(f"API Error: {status}")
+        self.status = status
+        self.body = body
+
+class CircuitBreaker:
+    """Предохранитель для вызовов Trello.
+    
+    После TRELLO_BREAKER_FAILURE_THRESHOLD сбоев подряд запросы сразу
+    отклоняются. Через recovery_timeout пропускается один пробный запрос:
+    его успех замыкает предохранитель, а сбой снова размыкает. Если исход
+    пробного запроса не известен через probe_timeout (запрос отменен или
+    упал с неучтенной ошибкой), пропускается следующий пробный запрос.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int, recovery_timeout: float, probe_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe_timeout = probe_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.trips = 0
+        self.rejected = 0
+        
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+        
+    def allow_request(self) -> bool:
+        """Можно ли сейчас отправить запрос"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.recovery_timeout:
+            # Пропускаем один пробный запрос
+            self.state = self.HALF_OPEN
+            self.probe_started = now
+            return True
+        if self.state == self.HALF_OPEN and now - self.probe_started >= self.probe_timeout:
+            # Исход предыдущего пробного запроса потерян
+            self.probe_started = now
+            return True
+        self.rejected += 1
+        return False
+        
+    def record_success(self):
+        self.failures = 0
+        self.state = self.CLOSED
+        
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+                logger.warning("Trello circuit breaker opened after %d failures", self.failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'rejected': self.rejected
+        }
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=settings.TRELLO_BREAKER_FAILURE_THRESHOLD,
+    recovery_timeout=settings.TRELLO_BREAKER_RECOVERY_TIMEOUT,
+    # Дольше самого длинного таймаута запроса пробный запрос не живет
+    probe_timeout=max(settings.TRELLO_BULK_TIMEOUT, settings.TRELLO_REQUEST_TIMEOUT)
+)
+
+# Повторять после сбоя можно только идемпотентные запросы
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE'}
+
+# Тяжелые выборки, которым нужен увеличенный таймаут
+BULK_ENDPOINTS = re.compile(r'^(batch|members/me/boards|boards/[^/]+/(cards|actions))$')
+
+def _request_timeout(method: str, endpoint: str) -> float:
+    """Таймаут запроса по классу эндпоинта"""
+    if BULK_ENDPOINTS.match(endpoint):
+        return settings.TRELLO_BULK_TIMEOUT
+    if method == 'GET':
+        return settings.TRELLO_READ_TIMEOUT
+    return settings.TRELLO_WRITE_TIMEOUT
+
+def _backoff_delay(attempt: int) -> float:
+    """Экспоненциальная задержка с полным джиттером"""
+    ceiling = min(settings.TRELLO_RETRY_MAX_DELAY, settings.TRELLO_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+class SingleFlight:
+    """Объединяет одинаковые одновременные запросы: пока первый выполняется,
+    остальные ждут его результата вместо отправки своего запроса"""
+    
+    def __init__(self):
+        self._calls: Dict[Tuple, asyncio.Future] = {}
+        self.coalesced = 0
+        
+    async def do(self, key: Tuple, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(task)
+        
+    def _forget(self, key: Tuple, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': len(self._calls),
+            'coalesced': self.coalesced
+        }
+
+single_flight = SingleFlight()
+
+# Только идемпотентные запросы можно объединять
+SINGLE_FLIGHT_METHODS = {'GET'}
+
+# Наборы полей под конкретных потребителей: каждый запрашивает
+# только то, что действительно показывает или сохраняет
+FIELD_PRESETS: Dict[str, Dict[str, Dict[str, str]]] = {
+    # Кнопки инлайн-клавиатур
+    'keyboard': {
+        'board': {'fields': 'name,url'},
+        'list': {'fields': 'name,idBoard'},
+        'card': {'fields': 'name'}
+    },
+    # Экран доски: списки вместе с id открытых карточек (для счетчиков)
+    'board_view': {
+        'list': {'fields': 'name,idBoard', 'cards': 'open', 'card_fields': 'id'}
+    },
+    # Экран списка с карточками
+    'list_view': {
+        'list': {'fields': 'name,idBoard'},
+        'card': {
+            'fields': 'name,labels,badges,idMembers,due,dateLastActivity',
+            'members': 'true',
+            'member_fields': 'username'
+        }
+    },
+    # Экран карточки
+    'card_detail': {
+        'card': {
+            'fields': 'name,desc,due,labels,idMembers,idList,idBoard,url,dateLastActivity',
+            'members': 'true',
+            'member_fields': 'username'
+        }
+    },
+    # Обзор досок для /boards и контекста ИИ
+    'summary': {
+        'board': {'fields': 'name,desc,url,dateLastActivity'},
+        'list': {'fields': 'name,pos,idBoard'},
+        'card': {'fields': 'name,desc,labels,idMembers,dateLastActivity'},
+        'member': {'fields': 'username,fullName'}
+    },
+    # Зеркалирование в локальную БД
+    'sync': {
+        'board': {'fields': 'name,desc,url,dateLastActivity'},
+        'list': {'fields': 'name,pos,closed,idBoard'},
+        'card': {'fields': 'name,desc,due,labels,idMembers,idList,pos,closed,dateLastActivity'}
+    }
+}
+
+def field_preset(preset: Optional[str], resource: str) -> Dict[str, str]:
+    """
+    Параметры запроса для набора полей.
+    
+    Args:
+        preset: Имя набора из FIELD_PRESETS; None - полные объекты
+        resource: Тип объекта ('board', 'list', 'card', 'member')
+        
+    Returns:
+        Dict[str, str]: Параметры запроса (пустые, если набор не задан)
+    """
+    if preset is None:
+        return {}
+    return dict(FIELD_PRESETS[preset].get(resource, {}))
+
+# Ключ и токен в строке запроса (например, в тексте исключения aiohttp)
+_SECRET_PARAMS = re.compile(r'((?:key|token)=)[^&\s\'"]+')
+
+def _redact(text: str) -> str:
+    """Скрывает ключ и токен Trello в тексте для логов"""
+    return _SECRET_PARAMS.sub(r'\1***', text)
+
+def _log_request(method: str, endpoint: str, status: int, elapsed: float, waited: float,
+                 body: Optional[bytes] = None):
+    """Логирует запрос к Trello.
+    
+    Ошибки и медленные запросы пишутся всегда и подробно, успешные -
+    только выборочно (TRELLO_LOG_SAMPLE_RATE). Сообщение форматируется
+    логгером лениво, только если запись действительно будет выведена.
+    """
+    elapsed_ms = elapsed * 1000
+    if status != 200:
+        logger.error(
+            "trello_request method=%s endpoint=%s status=%s duration_ms=%.0f wait_ms=%.0f body=%.500r",
+            method, endpoint, status, elapsed_ms, waited * 1000, body
+        )
+    elif elapsed_ms >= settings.TRELLO_SLOW_REQUEST_MS:
+        logger.warning(
+            "trello_request method=%s endpoint=%s status=%s duration_ms=%.0f wait_ms=%.0f slow=true",
+            method, endpoint, status, elapsed_ms, waited * 1000
+        )
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "trello_request method=%s endpoint=%s status=%s duration_ms=%.0f wait_ms=%.0f",
+            method, endpoint, status, elapsed_ms, waited * 1000
+        )
+    elif random.random() < settings.TRELLO_LOG_SAMPLE_RATE:
+        logger.info(
+            "trello_request method=%s endpoint=%s status=%s duration_ms=%.0f wait_ms=%.0f sampled=true",
+            method, endpoint, status, elapsed_ms, waited * 1000
+        )
+
+def _parse_retry_after(value: Optional[str]) -> float:
+    """Разбирает заголовок Retry-After (секунды), по умолчанию - одно окно лимита"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return settings.TRELLO_RATE_LIMIT_WINDOW
+
 class TrelloClient:
     BASE_URL = "https://api.trello.com/1"
+    BATCH_MAX_URLS = 10  # Ограничение Trello на число URL в /batch
     
-    def __init__(self):
+    def __init__(self, token: Optional[str] = None,
+                 session_provider: Optional[Callable[[], Awaitable[aiohttp.ClientSession]]] = None):
+        """
+        Args:
+            token: Токен пользователя; None - глобальный токен из настроек
+            session_provider: Возвращает общую сессию другого клиента; без него
+                клиент сам владеет пулом соединений
+        """
         self.key = settings.TRELLO_API_KEY
-        self.token = settings.TRELLO_TOKEN
-        logger.info(f"TrelloClient initialized with key: {self.key[:10]}...")
+        self.token = token or settings.TRELLO_TOKEN
+        # Сессия живет все время работы приложения, чтобы переиспользовать
+        # TCP/TLS соединения вместо нового рукопожатия на каждый запрос
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_provider = session_provider
+        # Пространство имен кэша ответов: данные разных токенов не смешиваются
+        self.cache_namespace = hashlib.sha256((self.token or '').encode()).hexdigest()[:12]
+        self._refreshing = set()
+        # GET-запросы, ожидающие отправки одним /batch
+        self._batch_queue: List[Tuple[str, Optional[dict], asyncio.Future]] = []
+        self._batch_timer: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks = set()
+        # Индекс меток по доскам: board_id -> (истекает, {имя в нижнем регистре: метка})
+        self._label_index: Dict[str, Tuple[float, Dict[str, Dict]]] = {}
+        self._label_locks: Dict[str, asyncio.Lock] = {}
+        # Справочник участников: board_id -> (истекает, {username в нижнем регистре: участник})
+        self._member_index: Dict[str, Tuple[float, Dict[str, Dict]]] = {}
+        logger.debug("TrelloClient initialized (cache namespace %s)", self.cache_namespace)
+        
+    async def start(self):
+        """Открывает пул соединений (вызывается при старте приложения)"""
+        await self._get_session()
+        
+    async def close(self):
+        """Закрывает пул соединений (вызывается при остановке приложения)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+            
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую сессию, создавая ее при первом обращении"""
+        if self._session_provider is not None:
+            # Сессию каждый раз берем у владельца: она могла быть пересоздана
+            return await self._session_provider()
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.TRELLO_POOL_LIMIT,
+                limit_per_host=settings.TRELLO_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=settings.TRELLO_DNS_CACHE_TTL,
+                keepalive_timeout=settings.TRELLO_KEEPALIVE_TIMEOUT
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=settings.TRELLO_REQUEST_TIMEOUT,
+                connect=settings.TRELLO_CONNECT_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
         
     async def _make_request(self, method: str, endpoint: str, params: dict = None, data: dict = None):
-        if params is None:
-            params = {}
+        ttl = get_cache_ttl(endpoint) if method == 'GET' else None
+        if ttl is not None:
+            return await self._cached_get(endpoint, params, ttl)
+            
+        previous_list_id = None
+        if method == 'PUT' and data and data.get('idList') and endpoint.startswith('cards/'):
+            # После переноса карточки кэш старого списка тоже устаревает
+            previous_list_id = self._cached_card_list_id(endpoint)
+            
+        result, _ = await self._send(method, endpoint, params, data)
+        if method != 'GET' and not (isinstance(result, dict) and 'error' in result):
+            self._invalidate_after_write(endpoint, data, result, previous_list_id)
+        return result
+        
+    async def _cached_get(self, endpoint: str, params: Optional[dict], ttl: float):
+        """GET через кэш ответов.
+        
+        Свежая запись отдается сразу. Устаревшая запись тоже отдается сразу,
+        а в фоне запускается ее перепроверка.
+        """
+        key = make_cache_key(self.cache_namespace, endpoint, params)
+        entry = response_cache.get(key)
+        if entry is not None:
+            if entry.fresh_until > time.monotonic():
+                response_cache.hits += 1
+            elif circuit_breaker.is_open:
+                # Обновлять бессмысленно: отдаем то, что есть
+                response_cache.stale_hits += 1
+            else:
+                response_cache.stale_hits += 1
+                self._schedule_refresh(key, endpoint, params, ttl)
+            return entry.value
+            
+        response_cache.misses += 1
+        try:
+            return await self._fetch_into_cache(key, endpoint, params, ttl)
+        except TrelloUnavailableError:
+            # Пока Trello недоступен, лучше показать старые данные, чем ошибку
+            fallback = response_cache.get(key, include_expired=True)
+            if fallback is None:
+                raise
+            logger.warning("Serving expired cache for %s: Trello is unavailable", endpoint)
+            return fallback.value
         
+    async def _fetch_into_cache(self, key, endpoint: str, params: Optional[dict], ttl: float):
+        result, size = await self._send('GET', endpoint, params)
+        if not (isinstance(result, dict) and 'error' in result):
+            response_cache.set(key, result, size, ttl)
+        return result
+        
+    def _schedule_refresh(self, key, endpoint: str, params: Optional[dict], ttl: float):
+        """Запускает фоновую перепроверку записи (не больше одной на ключ)"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.ensure_future(self._refresh(key, endpoint, params, ttl))
+        task.add_done_callback(lambda _: self._refreshing.discard(key))
+        
+    async def _refresh(self, key, endpoint: str, params: Optional[dict], ttl: float):
+        try:
+            entry = response_cache.get(key)
+            if entry is not None and entry.marker:
+                # Дешевая проверка: если dateLastActivity не изменилась,
+                # данные актуальны и полный ответ не нужен
+                probe, _ = await self._send('GET', endpoint, {'fields': 'dateLastActivity'})
+                if isinstance(probe, dict) and probe.get('dateLastActivity') == entry.marker:
+                    response_cache.touch(key, ttl)
+                    return
+            await self._fetch_into_cache(key, endpoint, params, ttl)
+        except Exception as e:
+            logger.warning("Error refreshing cached %s: %s", endpoint, _redact(str(e)))
+            
+    def _cached_card_list_id(self, endpoint: str) -> Optional[str]:
+        """idList карточки по кэшу; '' - если карточки в кэше нет"""
+        for value in response_cache.peek(self.cache_namespace, endpoint):
+            if isinstance(value, dict) and value.get('idList'):
+                return value['idList']
+        return ''
+            
+    def _invalidate_after_write(self, endpoint: str, data: Optional[dict],
+                                result: Any = None, previous_list_id: Optional[str] = None):
+        """Сбрасывает кэш объектов, затронутых изменяющим запросом
+        
+        Args:
+            endpoint: Эндпоинт запроса
+            data: Тело запроса
+            result: Ответ Trello (idBoard и idList измененного объекта)
+            previous_list_id: Список карточки до переноса; '' - неизвестен
+        """
+        parts = endpoint.split('/')
+        if len(parts) >= 2:
+            response_cache.invalidate(self.cache_namespace, '/'.join(parts[:2]))
+        if data and data.get('idList'):
+            response_cache.invalidate(self.cache_namespace, f"lists/{data['idList']}")
+        if isinstance(result, dict):
+            # Списки доски кэшируются вместе с id карточек (экран доски)
+            if result.get('idBoard'):
+                response_cache.invalidate(self.cache_namespace, f"boards/{result['idBoard']}")
+            if result.get('idList'):
+                response_cache.invalidate(self.cache_namespace, f"lists/{result['idList']}")
+        if previous_list_id:
+            response_cache.invalidate(self.cache_namespace, f"lists/{previous_list_id}")
+        elif previous_list_id == '':
+            # Откуда перенесена карточка, неизвестно: сбрасываем все списки
+            response_cache.invalidate(self.cache_namespace, 'lists/')
+            
+    async def _send(self, method: str, endpoint: str, params: dict = None, data: dict = None) -> Tuple[Any, int]:
+        """Выполняет запрос к Trello, возвращает ответ и размер тела.
+        
+        Одинаковые одновременные GET-запросы выполняются один раз.
+        """
+        if method not in SINGLE_FLIGHT_METHODS:
+            return await self._perform(method, endpoint, params, data)
+            
+        flight_key = (self.key, self.token, method, endpoint, tuple(sorted((params or {}).items())))
+        return await single_flight.do(
+            flight_key,
+            lambda: self._perform(method, endpoint, params, data)
+        )
+        
+    async def _perform(self, method: str, endpoint: str, params: dict = None, data: dict = None) -> Tuple[Any, int]:
+        params = dict(params or {})
         params.update({
             'key': self.key,
             'token': self.token
         })
         
         url = f"{self.BASE_URL}/{endpoint}"
-        logger.info(f"Making request to Trello: {method} {url}")
-        logger.info(f"Params: {params}")
+        
+        if not circuit_breaker.allow_request():
+            raise TrelloUnavailableError("Trello API is unavailable (circuit open)")
+            
+        timeout = aiohttp.ClientTimeout(
+            total=_request_timeout(method, endpoint),
+            connect=settings.TRELLO_CONNECT_TIMEOUT
+        )
+        retryable = method in IDEMPOTENT_METHODS
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.request(method, url, params=params, json=data) as response:
-                    response_text = await response.text()
-                    logger.info(f"Response status: {response.status}")
-                    logger.info(f"Response text: {response_text[:200]}...")
+            session = await self._get_session()
+            attempt = 0
+            throttled = 0
+            while True:
+                waited = await rate_limiter.acquire(self.key, self.token)
+                started = time.monotonic()
                     
-                    if response.status != 200:
-                        logger.error(f"Trello API error. Status: {response.status}, Response: {response_text}")
-                        return {"error": f"API Error: {response.status}"}
-                    
-                    return await response.json()
+                try:
+                    async with session.request(method, url, params=params, json=data,
+                                               timeout=timeout) as response:
+                        # Тело читается один раз и разбирается без промежуточной строки
+                        body = await response.read()
+                        _log_request(method, endpoint, response.status,
+                                     time.monotonic() - started, waited,
+                                     body if response.status != 200 else None)
+                        
+                        if response.status == 429 and throttled < settings.TRELLO_RATE_LIMIT_RETRIES:
+                            # Лимит превышен: ставим запрос обратно в очередь
+                            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                            logger.warning("Trello rate limit hit, retrying %s %s in %ss",
+                                           method, endpoint, retry_after)
+                            rate_limiter.pause(self.key, self.token, retry_after)
+                            throttled += 1
+                            continue
+                        
+                        if response.status >= 500:
+                            raise TrelloServerError(response.status, body.decode('utf-8', 'replace'))
+                        
+                        circuit_breaker.record_success()
+                        
+                        if response.status != 200:
+                            return {"error": f"API Error: {response.status}"}, len(body)
+                        
+                        return json.loads(body), len(body)
+                except (aiohttp.ClientError, asyncio.TimeoutError, TrelloServerError) as e:
+                    circuit_breaker.record_failure()
+                    if not retryable or attempt >= settings.TRELLO_RETRY_ATTEMPTS or circuit_breaker.is_open:
+                        if isinstance(e, TrelloServerError):
+                            return {"error": str(e)}, len(e.body)
+                        raise
+                    delay = _backoff_delay(attempt)
+                    attempt += 1
+                    logger.warning("Trello request %s %s failed (%s), retry %d in %.2fs",
+                                   method, endpoint, _redact(repr(e)), attempt, delay)
+                    await asyncio.sleep(delay)
         except Exception as e:
-            logger.error(f"Error making request to Trello: {str(e)}")
+            logger.error("Error making request to Trello: %s %s: %s", method, endpoint, _redact(str(e)))
+            raise
+
+    async def _stream_array(self, endpoint: str, params: Optional[dict] = None) -> AsyncIterator[Any]:
+        """Потоково читает JSON-массив из ответа, не буферизуя тело целиком"""
+        params = dict(params or {})
+        params.update({
+            'key': self.key,
+            'token': self.token
+        })
+        url = f"{self.BASE_URL}/{endpoint}"
+        # Общий таймаут не подходит для долгой выгрузки: ограничиваем только
+        # подключение и паузы между фрагментами
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=settings.TRELLO_CONNECT_TIMEOUT,
+            sock_read=settings.TRELLO_REQUEST_TIMEOUT
+        )
+        logger.debug("Streaming from Trello: GET %s", endpoint)
+        
+        if not circuit_breaker.allow_request():
+            raise TrelloUnavailableError("Trello API is unavailable (circuit open)")
+            
+        session = await self._get_session()
+        attempt = 0
+        try:
+            while True:
+                await rate_limiter.acquire(self.key, self.token)
+                async with session.get(url, params=params, timeout=timeout) as response:
+                    if response.status == 429 and attempt < settings.TRELLO_RATE_LIMIT_RETRIES:
+                        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                        logger.warning("Trello rate limit hit, retrying stream %s in %ss", endpoint, retry_after)
+                        rate_limiter.pause(self.key, self.token, retry_after)
+                        attempt += 1
+                        continue
+                        
+                    if response.status >= 500:
+                        circuit_breaker.record_failure()
+                    else:
+                        circuit_breaker.record_success()
+                        
+                    if response.status != 200:
+                        body = await response.read()
+                        _log_request('GET', endpoint, response.status, 0.0, 0.0, body)
+                        raise Exception(f"API Error: {response.status}")
+                        
+                    chunks = response.content.iter_chunked(settings.TRELLO_STREAM_CHUNK_SIZE)
+                    async for item in iter_json_array(chunks):
+                        yield item
+                    return
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            # Сетевые сбои выгрузки учитываются так же, как сбои обычных запросов
+            circuit_breaker.record_failure()
             raise
+                
+    async def stream_board_cards(self, board_id: str, preset: Optional[str] = 'sync') -> AsyncIterator[Dict[str, Any]]:
+        """Отдает карточки доски по одной по мере чтения ответа.
+        
+        Память не растет с размером доски, поэтому метод подходит
+        для полной синхронизации больших досок.
+        """
+        async for card in self._stream_array(f'boards/{board_id}/cards',
+                                             params=field_preset(preset, 'card')):
+            yield card
+
+    async def batch_get(self, requests: List[Union[str, Tuple[str, Optional[dict]]]]) -> List[Any]:
+        """Выполняет независимые GET-запросы через /batch (до 10 URL за вызов).
+        
+        Args:
+            requests: Эндпоинты или пары (эндпоинт, параметры)
+            
+        Returns:
+            List[Any]: Ответы в том же порядке; неудачный запрос
+            представлен как {"error": ...}
+        """
+        routes = []
+        for request in requests:
+            endpoint, params = (request, None) if isinstance(request, str) else request
+            route = f"/{endpoint}"
+            if params:
+                # urlencode экранирует запятые, которые разделяют URL в /batch
+                route += f"?{urlencode(params)}"
+            routes.append(route)
+            
+        chunks = [routes[i:i + self.BATCH_MAX_URLS]
+                  for i in range(0, len(routes), self.BATCH_MAX_URLS)]
+        responses = await asyncio.gather(*(
+            self._make_request('GET', 'batch', params={'urls': ','.join(chunk)})
+            for chunk in chunks
+        ))
+        
+        results = []
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, dict) and 'error' in response:
+                results.extend(response for _ in chunk)
+                continue
+            for item in response:
+                if '200' in item:
+                    results.append(item['200'])
+                else:
+                    results.append({"error": f"API Error: {item.get('statusCode', item.get('message'))}"})
+        return results
+        
+    async def get_batched(self, endpoint: str, params: Optional[dict] = None) -> Any:
+        """GET-запрос, который объединяется с другими запросами,
+        сделанными в течение TRELLO_BATCH_WINDOW, в один вызов /batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch_queue.append((endpoint, params, future))
+        
+        if len(self._batch_queue) >= self.BATCH_MAX_URLS:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = loop.call_later(settings.TRELLO_BATCH_WINDOW, self._flush_batch)
+        return await future
+        
+    def _flush_batch(self):
+        """Отправляет накопленные GET-запросы"""
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        items, self._batch_queue = self._batch_queue, []
+        if items:
+            task = asyncio.ensure_future(self._run_batch(items))
+            # Держим ссылку на задачу, пока она не завершится
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+            
+    async def _run_batch(self, items: List[Tuple[str, Optional[dict], asyncio.Future]]):
+        try:
+            if len(items) == 1:
+                endpoint, params, _ = items[0]
+                results = [await self._make_request('GET', endpoint, params=params)]
+            else:
+                results = await self.batch_get([(endpoint, params) for endpoint, params, _ in items])
+            for (_, _, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики клиента Trello"""
+        return {
+            'rate_limiter': rate_limiter.stats(),
+            'cache': response_cache.stats(),
+            'single_flight': single_flight.stats(),
+            'circuit_breaker': circuit_breaker.stats()
+        }
 
     async def get_boards_with_details(self) -> List[Dict[str, Any]]:
         """Получить расширенную информацию о досках"""
         try:
             # Получаем базовую информацию о досках
             boards = await self._make_request('GET', 'members/me/boards', params={
-                'fields': 'all',
+                **field_preset('summary', 'board'),
                 'lists': 'open',
                 'labels': 'all',
-                'members': 'all'
+                'members': 'all',
+                'member_fields': FIELD_PRESETS['summary']['member']['fields']
             })
             
-            # Для каждой доски получаем дополнительную информацию
-            detailed_boards = []
-            for board in boards:
-                board_id = board['id']
-                
-                # Получаем списки
-                lists = await self._make_request('GET', f'boards/{board_id}/lists', params={
-                    'fields': 'all'
-                })
-                
-                # Получаем метки
-                labels = await self._make_request('GET', f'boards/{board_id}/labels')
-                
-                # Получаем последние активные карточки
-                cards = await self._make_request('GET', f'boards/{board_id}/cards', params={
-                    'fields': 'name,desc,dateLastActivity,labels,members',
-                    'limit': 10
-                })
-                
-                detailed_boards.append({
-                    **board,
-                    'lists': lists,
-                    'labels': labels,
-                    'recent_cards': cards
-                })
+            # Детали досок загружаются параллельно, но не больше
+            # TRELLO_BOARD_CONCURRENCY досок одновременно
+            semaphore = asyncio.Semaphore(settings.TRELLO_BOARD_CONCURRENCY)
+            
+            async def load(board: Dict[str, Any]) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self._load_board_details(board)
             
-            return detailed_boards
+            # gather сохраняет порядок досок
+            return list(await asyncio.gather(*(load(board) for board in boards)))
         except Exception as e:
             logger.error(f"Error getting boards with details: {e}")
             raise
 
+    async def get_boards_summary(self) -> List[Dict[str, Any]]:
+        """Краткая сводка по доскам: названия и число списков и карточек.
+        
+        Доски читаются одним запросом, списки с id карточек - через /batch
+        (один вызов на каждые 10 досок).
+        """
+        boards = await self.get_boards(preset='summary')
+        lists_results = await self.batch_get(
+            [(f"boards/{board['id']}/lists", field_preset('board_view', 'list'))
+             for board in boards]
+        ) if boards else []
+        
+        summaries = []
+        for board, lists in zip(boards, lists_results):
+            lists = lists if isinstance(lists, list) else []
+            summaries.append({
+                'id': board['id'],
+                'name': board['name'],
+                'desc': board.get('desc', ''),
+                'url': board.get('url'),
+                'lists_count': len(lists),
+                'cards_count': sum(len(lst.get('cards', [])) for lst in lists)
+            })
+        return summaries
+
+    async def _load_board_details(self, board: Dict[str, Any]) -> Dict[str, Any]:
+        """Загружает списки, метки и последние карточки одной доски.
+        
+        Ошибка загрузки не прерывает общий запрос: доска возвращается
+        с пустыми деталями и полем 'error'.
+        """
+        board_id = board['id']
+        try:
+            lists, labels, cards = await asyncio.gather(
+                # Получаем списки (через кэш ответов)
+                self._make_request('GET', f'boards/{board_id}/lists',
+                                   params=field_preset('summary', 'list')),
+                # Метки и карточки всех одновременно загружаемых досок
+                # уходят общими вызовами /batch
+                self.get_batched(f'boards/{board_id}/labels'),
+                # Получаем последние активные карточки
+                self.get_batched(f'boards/{board_id}/cards', params={
+                    **field_preset('summary', 'card'),
+                    'limit': 10
+                })
+            )
+            for result in (lists, labels, cards):
+                if isinstance(result, dict) and 'error' in result:
+                    raise Exception(result['error'])
+            # Метки уже загружены: создание карточек обойдется без запроса меток
+            self._remember_labels(board_id, labels)
+
+            return {
+                **board,
+                'lists': lists,
+                'labels': labels,
+                'recent_cards': cards
+            }
+        except Exception as e:
+            logger.warning(f"Error loading details for board {board_id}: {e}")
+            return {
+                **board,
+                'lists': [],
+                'labels': [],
+                'recent_cards': [],
+                'error': str(e)
+            }
+
     async def create_task_from_analysis(self, task_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Создает задачу на основе анализа ИИ"""
         try:
+            board_id = task_data.get('board_id')
+            
+            # Метки и участники определяются заранее и передаются
+            # в запрос создания карточки, а не отдельными POST
+            labels, members = await asyncio.gather(
+                self._resolve_labels(board_id, task_data.get('labels') or []),
+                self._find_board_members(board_id, task_data.get('members') or [])
+            )
+            
             # Создаем карточку
             card_data = {
                 'name': task_data['name'],
@@ -100,101 +845,258 @@ class TrelloClient:
             
             if task_data.get('due_date'):
                 card_data['due'] = task_data['due_date']
+            if labels:
+                card_data['idLabels'] = [label['id'] for label in labels]
+            if members:
+                card_data['idMembers'] = [member['id'] for member in members]
             
             card = await self._make_request('POST', 'cards', data=card_data)
             
             if 'error' in card:
                 return None
-                
-            card_id = card['id']
-            
-            # Добавляем метки
-            if task_data.get('labels'):
-                for label_name in task_data['labels']:
-                    label = await self._find_or_create_label(
-                        task_data['board_id'],
-                        label_name
-                    )
-                    if label:
-                        await self._make_request('POST', f'cards/{card_id}/idLabels',
-                                               data={'value': label['id']})
-            
-            # Добавляем участников
-            if task_data.get('members'):
-                for member in task_data['members']:
-                    member_data = await self._find_board_member(
-                        task_data['board_id'],
-                        member
-                    )
-                    if member_data:
-                        await self._make_request('POST', f'cards/{card_id}/idMembers',
-                                               data={'value': member_data['id']})
-            
-            # Создаем чек-лист если есть
+            
+            # Создаем чек-лист если есть. Карточка уже создана: ошибка
+            # чек-листа не должна выглядеть как неудача (повтор создал бы дубликат)
             if task_data.get('checklist_items'):
-                checklist = await self._make_request('POST', 'checklists',
-                                                   data={'idCard': card_id,
-                                                        'name': 'ToDo'})
-                
-                for item in task_data['checklist_items']:
-                    await self._make_request('POST', f'checklists/{checklist["id"]}/checkItems',
-                                           data={'name': item})
+                try:
+                    await self._add_checklist(card['id'], task_data['checklist_items'])
+                except Exception as e:
+                    logger.error("Error adding checklist to card %s: %s", card['id'], _redact(str(e)))
             
-            # Получаем обновленную карточку
-            return await self._make_request('GET', f'cards/{card_id}')
+            # Ответ на POST уже содержит все, что показывает бот, кроме
+            # объектов участников - их берем из уже найденных данных
+            card.setdefault('members', members)
+            return card
             
         except Exception as e:
             logger.error(f"Error creating task: {e}")
             return None
 
+    async def _resolve_labels(self, board_id: str, label_names: List[str]) -> List[Dict]:
+        """Находит или создает метки доски по именам"""
+        unique_names = list(dict.fromkeys(label_names))
+        labels = await asyncio.gather(*(
+            self._find_or_create_label(board_id, name) for name in unique_names
+        ))
+        return [label for label in labels if label]
+        
+    async def _add_checklist(self, card_id: str, items: List[str]) -> Optional[Dict]:
+        """Создает чек-лист и параллельно добавляет в него пункты"""
+        checklist = await self._make_request('POST', 'checklists',
+                                           data={'idCard': card_id,
+                                                'name': 'ToDo'})
+        if 'error' in checklist:
+            return None
+            
+        semaphore = asyncio.Semaphore(settings.TRELLO_CHECKLIST_CONCURRENCY)
+        
+        async def add_item(position: int, item: str):
+            async with semaphore:
+                # Явная позиция сохраняет порядок пунктов при параллельной вставке
+                await self._make_request('POST', f'checklists/{checklist["id"]}/checkItems',
+                                       data={'name': item, 'pos': position})
+                
+        await asyncio.gather(*(add_item(i + 1, item) for i, item in enumerate(items)))
+        return checklist
+
+    def _remember_labels(self, board_id: str, labels: List[Dict]) -> Dict[str, Dict]:
+        """Сохраняет метки доски в индексе"""
+        index = {
+            label['name'].lower(): label
+            for label in labels
+            if label.get('name')
+        }
+        self._label_index[board_id] = (time.monotonic() + settings.TRELLO_LABEL_CACHE_TTL, index)
+        return index
+        
+    def invalidate_labels(self, board_id: Optional[str] = None):
+        """Сбрасывает индекс меток доски (или всех досок)"""
+        if board_id is None:
+            self._label_index.clear()
+        else:
+            self._label_index.pop(board_id, None)
+            
+    async def _get_label_index(self, board_id: str) -> Dict[str, Dict]:
+        """Возвращает индекс меток доски, загружая его при необходимости"""
+        cached = self._label_index.get(board_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+            
+        # Справочники нескольких досок (например, при массовом создании)
+        # загружаются общим /batch
+        labels = await self.get_batched(f'boards/{board_id}/labels')
+        if isinstance(labels, dict) and 'error' in labels:
+            raise Exception(labels['error'])
+        return self._remember_labels(board_id, labels)
+
     async def _find_or_create_label(self, board_id: str, label_name: str) -> Optional[Dict]:
         """Находит или создает метку на доске"""
         try:
-            # Получаем существующие метки
-            labels = await self._make_request('GET', f'boards/{board_id}/labels')
-            
-            # Ищем подходящую метку
-            for label in labels:
-                if label['name'].lower() == label_name.lower():
+            # Блокировка по доске защищает от параллельного создания одной метки
+            lock = self._label_locks.setdefault(board_id, asyncio.Lock())
+            async with lock:
+                index = await self._get_label_index(board_id)
+                
+                # Ищем подходящую метку
+                label = index.get(label_name.lower())
+                if label:
                     return label
-            
-            # Создаем новую метку
-            return await self._make_request('POST', 'labels', data={
-                'name': label_name,
-                'idBoard': board_id,
-                'color': 'blue'  # Можно добавить логику выбора цвета
-            })
+                
+                # Создаем новую метку
+                label = await self._make_request('POST', 'labels', data={
+                    'name': label_name,
+                    'idBoard': board_id,
+                    'color': 'blue'  # Можно добавить логику выбора цвета
+                })
+                if isinstance(label, dict) and 'error' in label:
+                    return None
+                    
+                index[label_name.lower()] = label
+                return label
         except Exception as e:
             logger.error(f"Error with label: {e}")
             return None
 
     async def _find_board_member(self, board_id: str, username: str) -> Optional[Dict]:
         """Находит участника доски по имени пользователя"""
+        members = await self._find_board_members(board_id, [username])
+        return members[0] if members else None
+        
+    async def _get_member_index(self, board_id: str) -> Dict[str, Dict]:
+        """Возвращает справочник участников доски, загружая его при необходимости"""
+        cached = self._member_index.get(board_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+            
+        members = await self.get_batched(f'boards/{board_id}/members')
+        if isinstance(members, dict) and 'error' in members:
+            raise Exception(members['error'])
+        index = {
+            m.get('username', '').lower(): m
+            for m in members
+        }
+        self._member_index[board_id] = (time.monotonic() + settings.TRELLO_MEMBER_CACHE_TTL, index)
+        return index
+        
+    def invalidate_members(self, board_id: Optional[str] = None):
+        """Сбрасывает справочник участников доски (или всех досок)"""
+        if board_id is None:
+            self._member_index.clear()
+        else:
+            self._member_index.pop(board_id, None)
+
+    async def _find_board_members(self, board_id: str, usernames: List[str]) -> List[Dict]:
+        """Находит участников доски по именам пользователей"""
+        if not usernames:
+            return []
         try:
-            members = await self._make_request('GET', f'boards/{board_id}/members')
-            return next(
-                (m for m in members if m.get('username', '').lower() == username.lower()),
-                None
-            )
+            by_username = await self._get_member_index(board_id)
+            found = (by_username.get(username.lower()) for username in dict.fromkeys(usernames))
+            return [member for member in found if member]
         except Exception as e:
             logger.error(f"Error finding member: {e}")
+            return []
+
+    async def create_tasks_bulk(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Создает несколько задач из анализа параллельно.
+        
+        Метки и участники загружаются один раз на доску, после чего карточки
+        создаются не более чем по TRELLO_BULK_CONCURRENCY одновременно
+        (общий бюджет запросов соблюдает планировщик).
+        
+        Args:
+            tasks: Данные задач в формате create_task_from_analysis
+            
+        Returns:
+            List[Dict[str, Any]]: Для каждой задачи (в исходном порядке)
+            словарь с ключами 'task', 'card' и 'error'
+        """
+        board_ids = {task['board_id'] for task in tasks if task.get('board_id')}
+        await asyncio.gather(*(self._prefetch_board_directory(board_id) for board_id in board_ids))
+        
+        semaphore = asyncio.Semaphore(settings.TRELLO_BULK_CONCURRENCY)
+        
+        async def create(task: Dict[str, Any]) -> Dict[str, Any]:
+            if not task.get('list_id'):
+                return {'task': task, 'card': None, 'error': 'Не выбран список'}
+            async with semaphore:
+                card = await self.create_task_from_analysis(task)
+            if not card:
+                return {'task': task, 'card': None, 'error': 'Не удалось создать карточку'}
+            return {'task': task, 'card': card, 'error': None}
+            
+        return list(await asyncio.gather(*(create(task) for task in tasks)))
+        
+    async def _prefetch_board_directory(self, board_id: str):
+        """Заранее загружает метки и участников доски"""
+        try:
+            await asyncio.gather(
+                self._get_label_index(board_id),
+                self._get_member_index(board_id)
+            )
+        except Exception as e:
+            logger.warning(f"Error prefetching directory for board {board_id}: {e}")
+
+    async def get_board_actions(self, board_id: str, since: Optional[str] = None,
+                                limit: int = 1000, action_types: Optional[List[str]] = None):
+        """Получить действия на доске (от новых к старым)
+        
+        Args:
+            board_id: ID доски
+            since: ID действия или дата, после которых нужны действия
+            limit: Максимум действий (Trello отдает не больше 1000)
+            action_types: Типы действий; None - все
+        """
+        params = {'limit': limit}
+        if since:
+            params['since'] = since
+        if action_types:
+            params['filter'] = ','.join(action_types)
+        return await self._make_request('GET', f'boards/{board_id}/actions', params=params)
+
+    async def register_board_webhook(self, board_id: str, callback_url: str,
+                                     description: str = "CreatmanTaskBot") -> Optional[Dict]:
+        """Регистрирует вебхук Trello на изменения доски
+        
+        Returns:
+            Optional[Dict]: Созданный вебхук или None, если Trello отказал
+            (в том числе когда такой вебхук уже зарегистрирован)
+        """
+        webhook = await self._make_request('POST', 'webhooks', data={
+            'callbackURL': callback_url,
+            'idModel': board_id,
+            'description': description
+        })
+        if 'error' in webhook:
+            logger.info("Webhook for board %s not registered: %s", board_id, webhook['error'])
             return None
+        return webhook
+
+    async def get_boards(self, preset: Optional[str] = None):
+        """Получить доски текущего пользователя"""
+        return await self._make_request('GET', 'members/me/boards',
+                                        params=field_preset(preset, 'board'))
 
-    async def get_board(self, board_id: str):
+    async def get_board(self, board_id: str, preset: Optional[str] = None):
         """Получить информацию о конкретной доске"""
-        return await self._make_request('GET', f'boards/{board_id}')
+        return await self._make_request('GET', f'boards/{board_id}',
+                                        params=field_preset(preset, 'board'))
 
-    async def get_board_lists(self, board_id: str):
+    async def get_board_lists(self, board_id: str, preset: Optional[str] = None):
         """Получить списки на доске"""
-        return await self._make_request('GET', f'boards/{board_id}/lists')
+        return await self._make_request('GET', f'boards/{board_id}/lists',
+                                        params=field_preset(preset, 'list'))
         
-    async def get_list(self, list_id: str):
+    async def get_list(self, list_id: str, preset: Optional[str] = None):
         """Получить информацию о списке"""
-        return await self._make_request('GET', f'lists/{list_id}')
+        return await self._make_request('GET', f'lists/{list_id}',
+                                        params=field_preset(preset, 'list'))
 
-    async def get_list_cards(self, list_id: str):
+    async def get_list_cards(self, list_id: str, preset: Optional[str] = None):
         """Получить карточки списка"""
-        return await self._make_request('GET', f'lists/{list_id}/cards')
+        return await self._make_request('GET', f'lists/{list_id}/cards',
+                                        params=field_preset(preset, 'card'))
         
     async def get_card_members(self, card_id: str):
         """Получить участников карточки"""
@@ -219,9 +1121,10 @@ class TrelloClient:
         """Обновить карточку"""
         return await self._make_request('PUT', f'cards/{card_id}', data=data)
 
-    async def get_card(self, card_id: str):
+    async def get_card(self, card_id: str, preset: Optional[str] = None):
         """Получить информацию о карточке"""
-        return await self._make_request('GET', f'cards/{card_id}')
+        return await self._make_request('GET', f'cards/{card_id}',
+                                        params=field_preset(preset, 'card'))
 
     async def get_member(self):
         """Получить информацию о текущем пользователе"""
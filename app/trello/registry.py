@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.config import get_settings
+from app.trello.client import TrelloClient, rate_limiter
+from app.trello.cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class TrelloClientRegistry:
+    """Реестр клиентов Trello по токенам пользователей.
+
+    Каждый пользователь получает собственный экземпляр TrelloClient со своим
+    расшифрованным токеном: отдельный бюджет запросов (корзина по токену)
+    и отдельное пространство имен кэша. Все клиенты работают через общий
+    пул соединений клиента по умолчанию. Давно не использованные клиенты
+    вытесняются по LRU.
+    """
+
+    def __init__(self, max_clients: int, idle_ttl: float, token_ttl: float):
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self.token_ttl = token_ttl
+        # Клиент с глобальным токеном из настроек; владеет общим пулом соединений
+        self.default_client = TrelloClient()
+        self._clients: "OrderedDict[str, Tuple[TrelloClient, float]]" = OrderedDict()
+        # telegram_id -> (токен или None, когда истекает)
+        self._user_tokens: Dict[int, Tuple[Optional[str], float]] = {}
+        self.evictions = 0
+
+    async def start(self):
+        """Открывает общий пул соединений"""
+        await self.default_client.start()
+
+    async def close(self):
+        """Закрывает общий пул соединений и забывает клиентов"""
+        self._clients.clear()
+        await self.default_client.close()
+
+    async def get_client(self, token: Optional[str] = None) -> TrelloClient:
+        """
+        Возвращает клиента для токена.
+
+        Args:
+            token: Токен пользователя; None - клиент с глобальным токеном
+
+        Returns:
+            TrelloClient: Клиент на общем пуле соединений
+        """
+        if not token or token == self.default_client.token:
+            return self.default_client
+
+        now = time.monotonic()
+        cached = self._clients.get(token)
+        if cached is not None:
+            client = cached[0]
+            self._clients[token] = (client, now)
+            self._clients.move_to_end(token)
+            return client
+
+        client = TrelloClient(token=token, session_provider=self.default_client._get_session)
+        self._clients[token] = (client, now)
+        self._evict(now)
+        return client
+
+    async def get_client_for_user(self, telegram_id: int) -> TrelloClient:
+        """Возвращает клиента с токеном пользователя Telegram"""
+        token = await self._get_user_token(telegram_id)
+        return await self.get_client(token)
+
+    def forget_user(self, telegram_id: int):
+        """Сбрасывает закэшированный токен (например, после его смены)"""
+        self._user_tokens.pop(telegram_id, None)
+
+    async def _get_user_token(self, telegram_id: int) -> Optional[str]:
+        cached = self._user_tokens.get(telegram_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        loop = asyncio.get_running_loop()
+        # Синхронная сессия БД не должна блокировать event loop
+        token = await loop.run_in_executor(None, self._load_user_token, telegram_id)
+        self._user_tokens[telegram_id] = (token, time.monotonic() + self.token_ttl)
+        return token
+
+    @staticmethod
+    def _load_user_token(telegram_id: int) -> Optional[str]:
+        """Загружает и расшифровывает токен пользователя из БД"""
+        from app.db.base import SessionLocal
+        from app.models.user import User
+
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.telegram_id == str(telegram_id)).first()
+            if user and user.is_authorized:
+                return user.trello_token
+            return None
+        except Exception as e:
+            logger.error(f"Error loading Trello token for user {telegram_id}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _evict(self, now: float):
+        """Вытесняет простаивающих клиентов и лишних по LRU"""
+        while self._clients:
+            token, (client, last_used) = next(iter(self._clients.items()))
+            if len(self._clients) <= self.max_clients and now - last_used < self.idle_ttl:
+                break
+            del self._clients[token]
+            # Кэш и корзину лимита вытесненного клиента больше никто не прочитает
+            response_cache.invalidate(client.cache_namespace)
+            rate_limiter.forget_token(token)
+            self.evictions += 1
+
+    def invalidate_board(self, board_id: str):
+        """Сбрасывает метки и участников доски у всех клиентов"""
+        for client in [self.default_client] + [client for client, _ in self._clients.values()]:
+            client.invalidate_labels(board_id)
+            client.invalidate_members(board_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики клиентов Trello"""
+        return {
+            'clients': len(self._clients),
+            'client_evictions': self.evictions,
+            **self.default_client.get_stats()
+        }
+
+
+trello_clients = TrelloClientRegistry(
+    max_clients=settings.TRELLO_CLIENT_REGISTRY_SIZE,
+    idle_ttl=settings.TRELLO_CLIENT_IDLE_TTL,
+    token_ttl=settings.TRELLO_USER_TOKEN_TTL
+)
@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Request, Response
+from app.config import get_settings
+from app.db.session import async_session
+from app.trello.client import TrelloClient
+from app.trello.registry import trello_clients
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/trello", tags=["trello"])
+settings = get_settings()
+
+
+def get_callback_url() -> str:
+    """URL, на который Trello отправляет события"""
+    if settings.TRELLO_WEBHOOK_URL:
+        return settings.TRELLO_WEBHOOK_URL
+    return f"{(settings.APP_URL or '').rstrip('/')}/trello/webhook"
+
+
+def verify_signature(body: bytes, signature: Optional[str], callback_url: str) -> bool:
+    """
+    Проверяет подпись X-Trello-Webhook.
+
+    Trello подписывает тело запроса вместе с callback URL: base64(HMAC-SHA1).
+    """
+    if not signature:
+        return False
+    digest = hmac.new(
+        settings.TRELLO_API_SECRET.encode(),
+        body + callback_url.encode(),
+        hashlib.sha1
+    ).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+
+
+async def register_board_webhooks(client: TrelloClient, board_ids: List[str]) -> List[Dict[str, Any]]:
+    """Регистрирует вебхуки для досок, возвращает созданные"""
+    callback_url = get_callback_url()
+    registered = []
+    for board_id in board_ids:
+        webhook = await client.register_board_webhook(board_id, callback_url)
+        if webhook:
+            registered.append(webhook)
+    return registered
+
+
+async def register_all_board_webhooks() -> List[Dict[str, Any]]:
+    """
+    Регистрирует вебхуки для всех досок глобального токена.
+
+    Вызывается при старте приложения. Без TRELLO_API_SECRET обработчик
+    отклоняет все события, поэтому регистрировать вебхуки бессмысленно.
+    Уже существующие вебхуки Trello не дублирует (отвечает ошибкой).
+    """
+    if not settings.TRELLO_API_SECRET:
+        logger.info("TRELLO_API_SECRET is not set: Trello webhooks are disabled")
+        return []
+    if not (settings.TRELLO_WEBHOOK_URL or settings.APP_URL):
+        logger.info("Neither TRELLO_WEBHOOK_URL nor APP_URL is set: Trello webhooks are disabled")
+        return []
+    try:
+        client = trello_clients.default_client
+        boards = await client.get_boards(preset='keyboard')
+        registered = await register_board_webhooks(client, [board['id'] for board in boards])
+        logger.info("Registered %d Trello webhooks", len(registered))
+        return registered
+    except Exception as e:
+        logger.error(f"Error registering Trello webhooks: {e}")
+        return []
+
+
+@router.head("/webhook")
+async def trello_webhook_check():
+    """Trello проверяет доступность callback URL запросом HEAD при регистрации"""
+    return Response(status_code=200)
+
+
+@router.post("/webhook")
+async def trello_webhook(request: Request):
+    body = await request.body()
+    if not settings.TRELLO_API_SECRET:
+        # Без секрета подпись не проверить: событие мог прислать кто угодно
+        logger.warning("Rejected Trello webhook: TRELLO_API_SECRET is not set")
+        return Response(status_code=403)
+    if not verify_signature(body, request.headers.get('X-Trello-Webhook'), get_callback_url()):
+        logger.warning("Rejected Trello webhook with invalid signature")
+        return Response(status_code=401)
+
+    try:
+        from app.services.sync_service import TrelloSyncService
+
+        action = json.loads(body).get('action') or {}
+        async with async_session() as session:
+            service = TrelloSyncService(session, trello_clients.default_client)
+            applied = await service.apply_action(action)
+
+        # Метки и участники доски кэшируются в каждом клиенте отдельно
+        data = action.get('data', {})
+        board_id = data.get('board', {}).get('id')
+        if board_id and (data.get('label') or data.get('idMember')):
+            trello_clients.invalidate_board(board_id)
+
+        logger.debug("Trello action %s applied=%s", action.get('type'), applied)
+    except Exception as e:
+        # Ошибка не должна приводить к повторной доставке: зеркало
+        # все равно будет исправлено следующей синхронизацией
+        logger.error(f"Error applying Trello action: {e}", exc_info=True)
+
+    return {"ok": True}
@@ -0,0 +1,81 @@
+import codecs
+import json
+from typing import Any, AsyncIterator
+
+_WHITESPACE = ' \t\n\r'
+# Символы, которые могут идти сразу после элемента массива
+_ITEM_TERMINATORS = _WHITESPACE + ',]'
+
+
+def _skip_whitespace(buffer: str, pos: int) -> int:
+    while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Потоково разбирает JSON-массив верхнего уровня.
+
+    Элементы отдаются по мере получения, поэтому в памяти хранится
+    только текущий элемент и недочитанный хвост, а не весь ответ.
+
+    Args:
+        chunks: Асинхронный итератор байтовых фрагментов ответа
+
+    Yields:
+        Any: Очередной элемент массива
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    iterator = chunks.__aiter__()
+    buffer = ''
+    started = False
+    eof = False
+
+    while True:
+        pos = 0
+        while True:
+            pos = _skip_whitespace(buffer, pos)
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Элемент еще не пришел целиком
+                break
+            if end >= len(buffer):
+                if not eof:
+                    # Значение могло оборваться на границе фрагмента (например, число)
+                    break
+            elif buffer[end] not in _ITEM_TERMINATORS:
+                if eof:
+                    raise ValueError("Unexpected character after JSON array item")
+                # Число разобрано не целиком: "1." до прихода "5e10"
+                break
+            yield item
+            pos = end
+
+        buffer = buffer[pos:]
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        try:
+            chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            eof = True
+            buffer += text_decoder.decode(b'', final=True)
+            continue
+        buffer += text_decoder.decode(chunk)
@@ -0,0 +1,67 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Асинхронный token bucket.
+
+    Запросы, которым не хватило токенов, не отклоняются, а ждут в очереди
+    (в порядке поступления) до пополнения корзины.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Скорость пополнения (токенов в секунду)
+            capacity: Максимальное количество токенов (размер всплеска)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.waiting = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def pause(self, seconds: float):
+        """Блокирует выдачу токенов на указанное время (например, по Retry-After)"""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """
+        Забирает один токен, при необходимости дожидаясь его.
+
+        Returns:
+            float: Время ожидания в секундах
+        """
+        # Lock создается лениво, чтобы привязаться к работающему event loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._blocked_until - now
+                    if delay <= 0:
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            break
+                        delay = (1 - self._tokens) / self.rate
+                    await asyncio.sleep(delay)
+        finally:
+            self.waiting -= 1
+        return time.monotonic() - started
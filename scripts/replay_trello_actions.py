@@ -0,0 +1,58 @@
+"""Отправляет записанные действия Trello на локальный вебхук.
+
+Заменяет Trello при локальной проверке: каждый JSON-файл содержит одно
+действие, payload вебхука ({"action": ...}) или список действий.
+
+    python scripts/replay_trello_actions.py actions/*.json --url http://localhost:8000/trello/webhook
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+
+import requests
+
+
+def load_actions(path):
+    with open(path, encoding='utf-8') as f:
+        payload = json.load(f)
+    if isinstance(payload, list):
+        return payload
+    return [payload.get('action', payload)]
+
+
+def sign(body: bytes, callback_url: str, secret: str) -> str:
+    digest = hmac.new(secret.encode(), body + callback_url.encode(), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+', help='JSON-файлы с действиями')
+    parser.add_argument('--url', default='http://localhost:8000/trello/webhook')
+    parser.add_argument('--callback-url', default=os.environ.get('TRELLO_WEBHOOK_URL'),
+                        help='callback URL, с которым считается подпись')
+    args = parser.parse_args()
+
+    secret = os.environ.get('TRELLO_API_SECRET')
+    if not secret:
+        # Вебхук без подписи отклоняется
+        sys.exit("TRELLO_API_SECRET is required to sign actions")
+    for path in args.files:
+        for action in load_actions(path):
+            body = json.dumps({'action': action}).encode()
+            headers = {
+                'Content-Type': 'application/json',
+                'X-Trello-Webhook': sign(body, args.callback_url or args.url, secret)
+            }
+            response = requests.post(args.url, data=body, headers=headers)
+            print(f"{action.get('type')}: {response.status_code}")
+            if response.status_code != 200:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
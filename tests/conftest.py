@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Настройки читаются при импорте модулей приложения, поэтому обязательные
+# переменные окружения задаются до первого импорта
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test-bot-token')
+os.environ.setdefault('TRELLO_API_SECRET', 'test-trello-secret')
+os.environ.setdefault('TRELLO_WEBHOOK_URL', 'https://bot.example.com/trello/webhook')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,41 @@
+import pytest
+from app.services import board_summary as board_summary_module
+from app.services.board_summary import BoardSummaryService
+from app.trello.registry import trello_clients
+
+LIVE = [{'id': 'board1', 'name': 'Live', 'lists_count': 1, 'cards_count': 2}]
+
+
+@pytest.fixture
+def live_client(monkeypatch):
+    client = trello_clients.default_client
+
+    async def get_boards_summary():
+        return LIVE
+
+    monkeypatch.setattr(client, 'get_boards_summary', get_boards_summary)
+    return client
+
+
+class BrokenSession:
+    async def __aenter__(self):
+        raise RuntimeError("no such table: boards")
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.mark.asyncio
+async def test_live_until_mirror_is_ready(live_client):
+    service = BoardSummaryService(max_age=300)
+    assert await service.get_summaries(live_client) == LIVE
+    assert service.get_stats()['live_fallbacks'] == 1
+
+
+@pytest.mark.asyncio
+async def test_live_when_mirror_read_fails(live_client, monkeypatch):
+    monkeypatch.setattr(board_summary_module, 'async_session', BrokenSession)
+    service = BoardSummaryService(max_age=300)
+    service.mirror_ready = True
+    assert await service.get_summaries(live_client) == LIVE
+    assert service.get_stats()['mirror_hits'] == 0
@@ -0,0 +1,33 @@
+import pytest
+from app.trello.client import rate_limiter
+from app.trello.registry import TrelloClientRegistry
+
+
+@pytest.mark.asyncio
+async def test_user_clients_follow_the_shared_session():
+    registry = TrelloClientRegistry(max_clients=10, idle_ttl=60, token_ttl=60)
+    await registry.start()
+    client = await registry.get_client('user-token')
+    try:
+        assert await client._get_session() is registry.default_client._session
+        # Пул пересоздан: пользовательский клиент берет новый, а не заводит свой
+        await registry.default_client.close()
+        session = await client._get_session()
+        assert session is registry.default_client._session
+        assert not session.closed
+    finally:
+        await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_evicted_client_drops_its_rate_limit_bucket():
+    registry = TrelloClientRegistry(max_clients=1, idle_ttl=60, token_ttl=60)
+    first = await registry.get_client('token-1')
+    await rate_limiter.acquire(first.key, first.token)
+    bucket_id = rate_limiter._bucket_id('token', 'token-1')
+    assert bucket_id in rate_limiter._buckets
+
+    await registry.get_client('token-2')
+
+    assert bucket_id not in rate_limiter._buckets
+    await registry.close()
@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from app.bot.forward_buffer import ForwardCollector
+
+
+class FlushRecorder:
+    """Записывает обработанные пачки"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, user_id, message, items):
+        self.batches.append((user_id, message, items))
+
+
+@pytest.mark.asyncio
+async def test_flush_all_processes_pending_batches():
+    recorder = FlushRecorder()
+    collector = ForwardCollector(recorder, quiet_window=60, max_delay=60)
+    collector.add(1, 'm1', {'text': 'a'})
+    collector.add(1, 'm2', {'text': 'b'})
+    collector.add(2, 'm3', {'text': 'c'})
+
+    await collector.flush_all()
+
+    assert sorted(recorder.batches) == [
+        (1, 'm2', [{'text': 'a'}, {'text': 'b'}]),
+        (2, 'm3', [{'text': 'c'}])
+    ]
+    assert collector.get_stats()['buffered_users'] == 0
+
+
+@pytest.mark.asyncio
+async def test_discarded_batch_is_not_flushed():
+    recorder = FlushRecorder()
+    collector = ForwardCollector(recorder, quiet_window=0.01, max_delay=1)
+    collector.add(1, 'm1', {'text': 'a'})
+
+    collector.discard(1)
+    await asyncio.sleep(0.05)
+    await collector.flush(1)
+
+    assert recorder.batches == []
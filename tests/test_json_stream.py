@@ -0,0 +1,38 @@
+import json
+import pytest
+from app.utils.json_stream import iter_json_array
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(data: bytes, size: int):
+    return [item async for item in iter_json_array(chunked(data, size))]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 1024])
+@pytest.mark.parametrize('value', [
+    [1.5, -2],
+    [1.5e10],
+    [0, 12345, -0.25, 3e-7, True, False, None],
+    ['строка', {'id': 'card1', 'labels': [{'name': 'срочно'}]}, []],
+    [],
+])
+async def test_items_survive_any_chunk_boundary(value, size):
+    data = json.dumps(value, ensure_ascii=False).encode()
+    assert await collect(data, size) == value
+
+
+@pytest.mark.asyncio
+async def test_whitespace_between_items():
+    assert await collect(b' [ 1 ,\n 2.5 ] ', 1) == [1, 2.5]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('data', [b'[1, 2', b'[1x]', b'{"a": 1}'])
+async def test_malformed_input_raises(data):
+    with pytest.raises(ValueError):
+        await collect(data, 1)
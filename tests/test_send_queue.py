@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from app.bot.send_queue import SendScheduler
+from app.bot.telegram_client import TelegramAPIError
+
+
+class FakeTelegramClient:
+    """Записывает вызовы Bot API в порядке отправки"""
+
+    def __init__(self, failures=None):
+        self.calls = []
+        # Ошибки, которые вернут первые вызовы
+        self.failures = list(failures or [])
+
+    async def _call(self, name, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.calls.append((name, kwargs.get('text') or kwargs.get('message_id')))
+        return {'message_id': len(self.calls), 'text': kwargs.get('text')}
+
+    async def send_message(self, **kwargs):
+        return await self._call('send', **kwargs)
+
+    async def edit_message_text(self, **kwargs):
+        return await self._call('edit', **kwargs)
+
+    async def delete_message(self, **kwargs):
+        return await self._call('delete', **kwargs)
+
+
+def make_scheduler(client):
+    # Лимиты заведомо выше нагрузки теста: проверяется порядок, а не скорость
+    return SendScheduler(client, global_rate=1000, chat_rate=1000, chat_burst=100, max_retries=2)
+
+
+@pytest.mark.asyncio
+async def test_chat_messages_keep_order():
+    client = FakeTelegramClient()
+    scheduler = make_scheduler(client)
+    await asyncio.gather(
+        scheduler.send_message(1, 'first'),
+        scheduler.send_message(1, 'second'),
+        scheduler.delete_message(1, 99),
+        scheduler.send_message(1, 'third'),
+    )
+    assert client.calls == [('send', 'first'), ('send', 'second'), ('delete', 99), ('send', 'third')]
+
+
+@pytest.mark.asyncio
+async def test_consecutive_edits_are_coalesced():
+    client = FakeTelegramClient()
+    scheduler = make_scheduler(client)
+    results = await asyncio.gather(
+        scheduler.send_message(1, 'head'),
+        scheduler.edit_message_text(1, 10, 'v1'),
+        scheduler.edit_message_text(1, 10, 'v2'),
+        scheduler.edit_message_text(1, 10, 'v3'),
+    )
+    assert client.calls == [('send', 'head'), ('edit', 'v3')]
+    # Каждый вызывающий получает результат итоговой правки
+    assert [result['text'] for result in results[1:]] == ['v3', 'v3', 'v3']
+    assert scheduler.get_stats()['coalesced_edits'] == 2
+
+
+@pytest.mark.asyncio
+async def test_edit_does_not_overtake_later_messages():
+    client = FakeTelegramClient()
+    scheduler = make_scheduler(client)
+    await asyncio.gather(
+        scheduler.send_message(1, 'head'),
+        scheduler.edit_message_text(1, 10, 'v1'),
+        scheduler.send_message(1, 'between'),
+        scheduler.edit_message_text(1, 10, 'v2'),
+    )
+    assert client.calls == [('send', 'head'), ('edit', 'v1'), ('send', 'between'), ('edit', 'v2')]
+    assert scheduler.get_stats()['coalesced_edits'] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_send_is_retried():
+    client = FakeTelegramClient(failures=[
+        TelegramAPIError('sendMessage', 429, 'Too Many Requests', retry_after=0.01)
+    ])
+    scheduler = make_scheduler(client)
+    result = await scheduler.send_message(1, 'hello')
+    assert result['text'] == 'hello'
+    assert client.calls == [('send', 'hello')]
+    assert scheduler.get_stats()['rate_limited'] == 1
+
+
+@pytest.mark.asyncio
+async def test_transient_error_is_retried(monkeypatch):
+    monkeypatch.setattr(SendScheduler, 'TRANSIENT_RETRY_DELAY', 0)
+    client = FakeTelegramClient(failures=[
+        TelegramAPIError('sendMessage', 502, 'non-JSON response (HTTP 502)')
+    ])
+    scheduler = make_scheduler(client)
+    await scheduler.send_message(1, 'hello')
+    assert client.calls == [('send', 'hello')]
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_reaches_caller():
+    client = FakeTelegramClient(failures=[
+        TelegramAPIError('sendMessage', 400, 'Bad Request: chat not found')
+    ])
+    scheduler = make_scheduler(client)
+    with pytest.raises(TelegramAPIError):
+        await scheduler.send_message(1, 'hello')
+    assert scheduler.get_stats()['failed'] == 1
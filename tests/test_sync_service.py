@@ -0,0 +1,181 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.models import Base, Board, List, Card
+from app.services.sync_service import TrelloSyncService
+
+
+class FakeTrelloClient:
+    """Отдает доску из словарей вместо запросов к Trello"""
+
+    def __init__(self, cards=None, lists=None, actions=None):
+        self.cards = cards or {}
+        self.lists = lists or [{'id': 'list1', 'name': 'List'}]
+        self.actions = actions or []
+        self.action_requests = 0
+
+    async def get_card(self, card_id, preset=None):
+        return self.cards.get(card_id, {'error': 'not found'})
+
+    async def get_board_lists(self, board_id, preset=None):
+        return self.lists
+
+    async def get_list_cards(self, list_id, preset=None):
+        return [card for card in self.cards.values() if card['idList'] == list_id]
+
+    async def stream_board_cards(self, board_id, preset='sync'):
+        for card in self.cards.values():
+            yield card
+
+    async def get_board_actions(self, board_id, since=None, limit=1000, action_types=None):
+        self.action_requests += 1
+        return self.actions[:limit]
+
+    def invalidate_labels(self, board_id):
+        pass
+
+
+@pytest_asyncio.fixture
+async def session():
+    engine = create_async_engine('sqlite+aiosqlite://', poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        board = Board(trello_id='board1', name='Board')
+        session.add(board)
+        await session.flush()
+        other = Board(trello_id='board2', name='Other')
+        session.add(other)
+        await session.flush()
+        session.add(List(trello_id='list1', board_id=board.id, name='List'))
+        session.add(List(trello_id='list2', board_id=other.id, name='Other list'))
+        await session.commit()
+        yield session
+    await engine.dispose()
+
+
+async def get_board(session, trello_id):
+    result = await session.execute(select(Board).where(Board.trello_id == trello_id))
+    return result.scalar_one()
+
+
+async def get_card(session, trello_id):
+    result = await session.execute(select(Card).where(Card.trello_id == trello_id))
+    return result.scalar_one_or_none()
+
+
+@pytest.mark.asyncio
+async def test_create_card_stores_due_date(session):
+    trello = FakeTrelloClient({'card1': {
+        'id': 'card1', 'name': 'Card', 'desc': 'Text', 'idList': 'list1',
+        'due': '2026-10-20T09:00:00.000Z'
+    }})
+    applied = await TrelloSyncService(session, trello).apply_action({
+        'type': 'createCard',
+        'data': {'card': {'id': 'card1', 'name': 'Card'}, 'list': {'id': 'list1'}}
+    })
+    assert applied
+    card = await get_card(session, 'card1')
+    assert card.description == 'Text'
+    assert card.due_date.replace(tzinfo=None) == datetime(2026, 10, 20, 9, 0)
+
+
+async def add_card(session, trello_id, list_trello_id='list1'):
+    result = await session.execute(select(List).where(List.trello_id == list_trello_id))
+    session.add(Card(trello_id=trello_id, list_id=result.scalar_one().id, name=trello_id))
+    await session.commit()
+
+
+async def card_list(session, trello_id):
+    card = await get_card(session, trello_id)
+    if card is None:
+        return None
+    result = await session.execute(select(List.trello_id).where(List.id == card.list_id))
+    return result.scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_unarchived_card_is_fetched(session):
+    trello = FakeTrelloClient({'card1': {'id': 'card1', 'name': 'Card', 'idList': 'list1'}})
+    await TrelloSyncService(session, trello).apply_action({
+        'type': 'updateCard',
+        'data': {
+            'card': {'id': 'card1', 'closed': False},
+            'old': {'closed': True},
+            'list': {'id': 'list1'}
+        }
+    })
+    assert await card_list(session, 'card1') == 'list1'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('order', [('to', 'from'), ('from', 'to')])
+async def test_card_moved_between_boards(session, order):
+    await add_card(session, 'card1')
+    service = TrelloSyncService(session, FakeTrelloClient())
+    actions = {
+        'from': {'type': 'moveCardFromBoard', 'data': {
+            'card': {'id': 'card1'}, 'board': {'id': 'board1'},
+            'boardTarget': {'id': 'board2'}, 'list': {'id': 'list1'}
+        }},
+        'to': {'type': 'moveCardToBoard', 'data': {
+            'card': {'id': 'card1'}, 'board': {'id': 'board2'},
+            'boardSource': {'id': 'board1'}, 'list': {'id': 'list2'}
+        }}
+    }
+    service.trello.cards = {'card1': {'id': 'card1', 'name': 'card1', 'idList': 'list2'}}
+    for kind in order:
+        await service.apply_action(actions[kind])
+    assert await card_list(session, 'card1') == 'list2'
+
+
+@pytest.mark.asyncio
+async def test_list_moved_to_board_brings_its_cards(session):
+    trello = FakeTrelloClient({'card1': {'id': 'card1', 'name': 'Card', 'idList': 'list3'}})
+    await TrelloSyncService(session, trello).apply_action({
+        'type': 'moveListToBoard',
+        'data': {'list': {'id': 'list3', 'name': 'Moved'}, 'board': {'id': 'board1'},
+                 'boardSource': {'id': 'board9'}}
+    })
+    assert await card_list(session, 'card1') == 'list3'
+
+
+@pytest.mark.asyncio
+async def test_full_sync_prunes_removed_rows(session):
+    board = await get_board(session, 'board1')
+    session.add(List(trello_id='archived', board_id=board.id, name='Archived'))
+    await session.commit()
+    await add_card(session, 'gone')
+    await add_card(session, 'kept')
+    await add_card(session, 'in_archived', 'archived')
+    trello = FakeTrelloClient(
+        {'kept': {'id': 'kept', 'name': 'Kept', 'idList': 'list1'}},
+        actions=[{'id': 'action1', 'date': '2026-10-16T10:00:00.000Z'}]
+    )
+    await TrelloSyncService(session, trello).sync_board({'id': 'board1', 'name': 'Board'})
+
+    assert await get_card(session, 'gone') is None
+    assert await get_card(session, 'in_archived') is None
+    assert await card_list(session, 'kept') == 'list1'
+    # Списки другой доски не трогаются
+    result = await session.execute(select(List.trello_id).order_by(List.trello_id))
+    assert result.scalars().all() == ['list1', 'list2']
+
+
+@pytest.mark.asyncio
+async def test_delta_falls_back_to_full_sync_when_full_sync_is_old(session):
+    trello = FakeTrelloClient(actions=[{'id': 'action1', 'date': '2026-10-16T10:00:00.000Z'}])
+    service = TrelloSyncService(session, trello)
+    board_data = {'id': 'board1', 'name': 'Board'}
+    assert not await service.sync_board_delta(board_data)
+    assert await service.sync_board_delta(board_data)
+
+    board = await get_board(session, 'board1')
+    board.last_full_sync = datetime.utcnow() - timedelta(days=30)
+    await session.commit()
+    # Дельта обновляет last_synced, но не срок полной синхронизации
+    assert not await service.sync_board_delta(board_data)
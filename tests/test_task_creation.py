@@ -0,0 +1,29 @@
+import pytest
+from app.trello.client import TrelloClient, TrelloUnavailableError
+
+
+class ChecklistFailingClient(TrelloClient):
+    """Карточка создается, а запрос чек-листа падает"""
+
+    def __init__(self):
+        super().__init__(token='test-token')
+        self.posted_cards = 0
+
+    async def _make_request(self, method, endpoint, params=None, data=None):
+        if endpoint == 'cards':
+            self.posted_cards += 1
+            return {'id': 'card1', 'name': data['name'], 'url': 'https://trello.com/c/card1'}
+        raise TrelloUnavailableError("Trello API is unavailable (circuit open)")
+
+
+@pytest.mark.asyncio
+async def test_checklist_error_still_returns_created_card():
+    client = ChecklistFailingClient()
+    card = await client.create_task_from_analysis({
+        'name': 'Task',
+        'board_id': 'board1',
+        'list_id': 'list1',
+        'checklist_items': ['one', 'two']
+    })
+    assert card['id'] == 'card1'
+    assert client.posted_cards == 1
@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import hmac
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from app.db.models import Base, Board, List, Card
+from app.trello import webhooks
+
+ACTION = {
+    'type': 'deleteCard',
+    'data': {'card': {'id': 'card1'}, 'board': {'id': 'board1'}}
+}
+
+
+def sign(body: bytes, secret: str, callback_url: str) -> str:
+    digest = hmac.new(secret.encode(), body + callback_url.encode(), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    """Зеркало в файле SQLite с одной карточкой"""
+    path = tmp_path / 'mirror.db'
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        board = Board(trello_id='board1', name='Board')
+        session.add(board)
+        session.flush()
+        lst = List(trello_id='list1', board_id=board.id, name='List')
+        session.add(lst)
+        session.flush()
+        session.add(Card(trello_id='card1', list_id=lst.id, name='Card'))
+        session.commit()
+    yield engine, f'sqlite+aiosqlite:///{path}'
+    engine.dispose()
+
+
+def card_ids(engine):
+    with Session(engine) as session:
+        return [card.trello_id for card in session.query(Card)]
+
+
+@pytest.fixture
+def client(mirror, monkeypatch):
+    _, async_url = mirror
+    # NullPool: TestClient выполняет обработчик в своем event loop
+    async_engine = create_async_engine(async_url, poolclass=NullPool)
+    monkeypatch.setattr(webhooks, 'async_session',
+                        sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False))
+    app = FastAPI()
+    app.include_router(webhooks.router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def body():
+    return json.dumps({'action': ACTION}).encode()
+
+
+def post(client, body, signature=None):
+    headers = {'Content-Type': 'application/json'}
+    if signature is not None:
+        headers['X-Trello-Webhook'] = signature
+    return client.post('/trello/webhook', content=body, headers=headers)
+
+
+def test_verify_signature_accepts_trello_signature(body):
+    callback_url = webhooks.get_callback_url()
+    signature = sign(body, webhooks.settings.TRELLO_API_SECRET, callback_url)
+    assert webhooks.verify_signature(body, signature, callback_url)
+    assert not webhooks.verify_signature(body + b' ', signature, callback_url)
+    assert not webhooks.verify_signature(body, signature, callback_url + '/other')
+    assert not webhooks.verify_signature(body, None, callback_url)
+
+
+def test_valid_signature_applies_action(client, mirror, body):
+    signature = sign(body, webhooks.settings.TRELLO_API_SECRET, webhooks.get_callback_url())
+    response = post(client, body, signature)
+    assert response.status_code == 200
+    assert card_ids(mirror[0]) == []
+
+
+def test_failed_action_is_still_acknowledged(client, mirror):
+    # Повторная доставка не поможет: ошибка только логируется
+    body = json.dumps({'action': {'type': 'updateCard', 'data': {}}}).encode()
+    signature = sign(body, webhooks.settings.TRELLO_API_SECRET, webhooks.get_callback_url())
+    response = post(client, body, signature)
+    assert response.status_code == 200
+    assert card_ids(mirror[0]) == ['card1']
+
+
+def test_missing_signature_is_rejected(client, mirror, body):
+    response = post(client, body)
+    assert response.status_code == 401
+    assert card_ids(mirror[0]) == ['card1']
+
+
+def test_forged_signature_is_rejected(client, mirror, body):
+    response = post(client, body, sign(body, 'wrong-secret', webhooks.get_callback_url()))
+    assert response.status_code == 401
+    assert card_ids(mirror[0]) == ['card1']
+
+
+def test_rejected_without_secret(client, mirror, body, monkeypatch):
+    monkeypatch.setattr(webhooks.settings, 'TRELLO_API_SECRET', None)
+    response = post(client, body, 'anything')
+    assert response.status_code == 403
+    assert card_ids(mirror[0]) == ['card1']
+
+
+def test_head_check_succeeds(client):
+    assert client.head('/trello/webhook').status_code == 200
@@ -0,0 +1,75 @@
+import pytest
+from app.bot.dedup import UpdateDeduplicator
+
+
+class FakeRedis:
+    """Минимальная замена redis.asyncio: SET NX EX и DELETE"""
+
+    def __init__(self, fail: bool = False):
+        self.keys = {}
+        self.fail = fail
+
+    async def set(self, key, value, nx=False, ex=None):
+        if self.fail:
+            raise ConnectionError("redis is down")
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    async def delete(self, key):
+        self.keys.pop(key, None)
+
+
+@pytest.mark.asyncio
+async def test_second_delivery_is_duplicate():
+    dedup = UpdateDeduplicator(window_size=10, ttl=60)
+    assert not await dedup.is_duplicate(1)
+    assert await dedup.is_duplicate(1)
+    assert not await dedup.is_duplicate(2)
+    assert dedup.get_stats()['duplicates'] == 1
+    assert dedup.get_stats()['backend'] == 'memory'
+
+
+@pytest.mark.asyncio
+async def test_window_is_bounded():
+    dedup = UpdateDeduplicator(window_size=3, ttl=60)
+    for update_id in range(5):
+        assert not await dedup.is_duplicate(update_id)
+    assert dedup.get_stats()['window'] == 3
+    # Самые старые id вытеснены из окна
+    assert not await dedup.is_duplicate(0)
+    assert await dedup.is_duplicate(4)
+
+
+@pytest.mark.asyncio
+async def test_forgotten_update_is_accepted_again():
+    dedup = UpdateDeduplicator(window_size=10, ttl=60)
+    assert not await dedup.is_duplicate(7)
+    await dedup.forget(7)
+    assert not await dedup.is_duplicate(7)
+
+
+@pytest.mark.asyncio
+async def test_shared_backend_catches_other_process_deliveries():
+    redis = FakeRedis()
+    first = UpdateDeduplicator(window_size=10, ttl=60)
+    second = UpdateDeduplicator(window_size=10, ttl=60)
+    first._redis = second._redis = redis
+
+    assert not await first.is_duplicate(42)
+    assert await second.is_duplicate(42)
+    assert second.get_stats()['duplicates'] == 1
+
+    await first.forget(42)
+    assert redis.keys == {}
+
+
+@pytest.mark.asyncio
+async def test_backend_errors_fall_back_to_local_window():
+    dedup = UpdateDeduplicator(window_size=10, ttl=60)
+    dedup._redis = FakeRedis(fail=True)
+
+    assert not await dedup.is_duplicate(5)
+    assert await dedup.is_duplicate(5)
+    assert dedup.get_stats()['backend_errors'] == 1